@@ -0,0 +1,104 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """
+    Bounded, per-process LRU of token key -> (user, token) whose entries
+    expire after TOKEN_CACHE_TTL seconds. accounts.signals evicts entries when
+    a token is deleted or its user saved; the TTL bounds how long other
+    processes keep serving an entry evicted here.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()  # key -> (expires_at, user, token)
+        self._keys_by_user = {}  # user id -> keys, so delete_user skips the scan
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def ttl(self):
+        return getattr(settings, "TOKEN_CACHE_TTL", 60)
+
+    @property
+    def maxsize(self):
+        return getattr(settings, "TOKEN_CACHE_SIZE", 10000)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def set(self, key, user, token):
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (time.monotonic() + self.ttl, user, token)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self.hits = self.misses = 0
+
+    def _discard(self, key):
+        # Callers hold the lock.
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_user[entry[1].pk]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_user[entry[1].pk]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that skips the token/user query for cached keys."""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, token)
+        else:
+            user, token = cached
+        # Views may set attributes on request.user; keep the cached one clean.
+        return copy.copy(user), token
@@ -0,0 +1,68 @@
+"""
+Block and mute sets for the read and notification paths.
+
+Each set is one UNION query over the blocking/muting tables, cached in the
+default cache for EXCLUSION_CACHE_TTL seconds and dropped by accounts.signals
+whenever either relation changes. Views read hidden_author_ids() once per
+request and exclude those authors with a NOT IN.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import CustomUser
+
+Block = CustomUser.blocking.through
+Mute = CustomUser.muting.through
+
+
+def cache_ttl():
+    return getattr(settings, "EXCLUSION_CACHE_TTL", 300)
+
+
+def cached_ids(name, user_id, query):
+    key = f"exclusions:{name}:{user_id}"
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(query())
+        cache.set(key, ids, cache_ttl())
+    return ids
+
+
+def hidden_ids(user_id):
+    """Users whose content `user_id` doesn't see: blocked, muted or blocking them."""
+    return cached_ids("hidden", user_id, lambda: (
+        Block.objects.filter(from_customuser_id=user_id).values_list("to_customuser_id", flat=True)
+        .union(Mute.objects.filter(from_customuser_id=user_id).values_list("to_customuser_id", flat=True))
+        .union(Block.objects.filter(to_customuser_id=user_id).values_list("from_customuser_id", flat=True))
+    ))
+
+
+def silenced_by_ids(user_id):
+    """Users who don't get notified of what `user_id` does: those blocking or muting them."""
+    return cached_ids("silenced_by", user_id, lambda: (
+        Block.objects.filter(to_customuser_id=user_id).values_list("from_customuser_id", flat=True)
+        .union(Mute.objects.filter(to_customuser_id=user_id).values_list("from_customuser_id", flat=True))
+    ))
+
+
+def blocked_between(user_id, other_ids):
+    """Those of `other_ids` that `user_id` blocks or is blocked by, in one uncached query."""
+    edges = Block.objects.filter(
+        Q(from_customuser_id=user_id, to_customuser_id__in=other_ids)
+        | Q(from_customuser_id__in=other_ids, to_customuser_id=user_id)
+    ).values_list("from_customuser_id", "to_customuser_id")
+    return {other if me == user_id else me for me, other in edges}
+
+
+def hidden_author_ids(request):
+    """hidden_ids() of the requesting user, loaded once per request."""
+    if not request.user.is_authenticated:
+        return frozenset()
+    if not hasattr(request, "_hidden_author_ids"):
+        request._hidden_author_ids = hidden_ids(request.user.pk)
+    return request._hidden_author_ids
+
+
+def invalidate(user_ids):
+    cache.delete_many([f"exclusions:{name}:{user_id}" for user_id in user_ids for name in ("hidden", "silenced_by")])
@@ -0,0 +1,33 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from accounts.throttling import TokenBucketThrottle
+
+
+class View:
+    throttle_scope = "benchmark"
+
+
+class Command(BaseCommand):
+    help = "Time TokenBucketThrottle.allow_request() against the configured cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--number", type=int, default=10000, help="Checks per timing run.")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, number, repeat, **options):
+        request = Request(RequestFactory().get("/"))
+        request.user = None
+        throttle, view = TokenBucketThrottle(), View()
+        rates = {**api_settings.DEFAULT_THROTTLE_RATES, "benchmark": f"{number * repeat * 2}/hour"}
+        with override_settings(REST_FRAMEWORK={**api_settings.user_settings, "DEFAULT_THROTTLE_RATES": rates}):
+            timings = timeit.repeat(lambda: throttle.allow_request(request, view), number=number, repeat=repeat)
+            throttle.cache.delete(throttle.get_cache_key(request))
+        best = min(timings) / number * 1e6
+        self.stdout.write(self.style.SUCCESS(
+            f"{best:.1f} µs per check (best of {repeat} x {number}, cache: {type(throttle.cache).__name__})"
+        ))
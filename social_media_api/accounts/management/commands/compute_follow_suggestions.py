@@ -0,0 +1,74 @@
+import itertools
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.models import CustomUser, FollowSuggestion
+
+Follow = CustomUser.following.through
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild FollowSuggestion from friends-of-friends: for every user, the accounts followed by the "
+        "accounts they follow, scored by how many of them lead there."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-k", type=int, default=20, help="Suggestions kept per user.")
+        parser.add_argument("--block-size", type=int, default=1000, help="Users scored per matrix product.")
+
+    def handle(self, *args, top_k, block_size, **options):
+        try:
+            import numpy as np
+            from scipy import sparse
+        except ImportError:
+            raise CommandError("compute_follow_suggestions requires numpy and scipy.")
+
+        edges = np.fromiter(
+            itertools.chain.from_iterable(
+                Follow.objects.values_list("from_customuser_id", "to_customuser_id").iterator(chunk_size=10000)
+            ),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        user_ids = np.unique(edges)
+        size = len(user_ids)
+        source, target = np.searchsorted(user_ids, edges[:, 0]), np.searchsorted(user_ids, edges[:, 1])
+        follows = sparse.csr_matrix((np.ones(len(edges), dtype=np.int32), (source, target)), shape=(size, size))
+
+        written = 0
+        for start in range(0, size, block_size):
+            block = follows[start:start + block_size]
+            # (A @ A)[u, v] = number of accounts u follows that follow v.
+            two_hop = (block @ follows).tocoo()
+            # COO indices are int32; widen them before packing (row, column) pairs.
+            rows, columns, scores = two_hop.row.astype(np.int64), two_hop.col.astype(np.int64), two_hop.data
+
+            # Drop u itself and accounts u already follows.
+            followed = block.tocoo()
+            followed_pairs = followed.row.astype(np.int64) * size + followed.col.astype(np.int64)
+            keep = (columns != rows + start) & ~np.isin(rows * size + columns, followed_pairs)
+            rows, columns, scores = rows[keep], columns[keep], scores[keep]
+
+            # Best top_k per row: sort by (row, -score, user id), rank within each row.
+            order = np.lexsort((columns, -scores, rows))
+            rows, columns, scores = rows[order], columns[order], scores[order]
+            rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+            keep = rank < top_k
+            rows, columns, scores = rows[keep], columns[keep], scores[keep]
+
+            users = user_ids[start:start + block_size]
+            with transaction.atomic():
+                FollowSuggestion.objects.filter(user_id__in=users.tolist()).delete()
+                FollowSuggestion.objects.bulk_create(
+                    [
+                        FollowSuggestion(user_id=int(user_id), suggested_id=int(suggested_id), score=int(score))
+                        for user_id, suggested_id, score in zip(users[rows], user_ids[columns], scores)
+                    ],
+                    batch_size=1000,
+                )
+            written += len(rows)
+
+        # Users who no longer follow anyone keep no stale suggestions.
+        FollowSuggestion.objects.exclude(user_id__in=Follow.objects.values("from_customuser_id")).delete()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} suggestions for {size} users."))
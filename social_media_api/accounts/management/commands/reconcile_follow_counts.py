@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import CustomUser
+
+Follow = CustomUser.following.through
+
+
+def count_of(column):
+    counts = Follow.objects.filter(**{column: OuterRef("pk")}).values(column).annotate(total=Count("*")).values("total")
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = "Recompute CustomUser.followers_count and following_count from the follow table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Users updated per statement.")
+
+    def handle(self, *args, chunk_size, **options):
+        last_id, updated = 0, 0
+        while True:
+            ids = list(
+                CustomUser.objects.filter(pk__gt=last_id).order_by("pk").values_list("pk", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                CustomUser.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]).update(
+                    followers_count=count_of("to_customuser"),
+                    following_count=count_of("from_customuser"),
+                )
+            last_id = ids[-1]
+            updated += len(ids)
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {updated} users."))
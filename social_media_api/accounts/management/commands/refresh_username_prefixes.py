@@ -0,0 +1,39 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import CustomUser, UsernamePrefix
+from accounts.views import AUTOCOMPLETE_LIMIT
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild UsernamePrefix: the most followed users for every short username prefix. "
+        "Schedule it hourly; autocomplete ranks changes since the last run only within its bounded scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--length", type=int, default=getattr(settings, "AUTOCOMPLETE_PREFIX_LENGTH", 3),
+            help="Longest prefix to precompute.",
+        )
+        parser.add_argument("--top", type=int, default=AUTOCOMPLETE_LIMIT * 2, help="Users kept per prefix.")
+
+    def handle(self, *args, length, top, **options):
+        # Walking users from most to least followed, a prefix's first `top`
+        # users are its ranking.
+        taken, rows = Counter(), []
+        users = CustomUser.objects.order_by("-followers_count", "pk").values_list("pk", "username_folded", "followers_count")
+        for user_id, folded, followers_count in users.iterator(chunk_size=10000):
+            for size in range(1, min(length, len(folded)) + 1):
+                prefix = folded[:size]
+                if taken[prefix] < top:
+                    taken[prefix] += 1
+                    rows.append(UsernamePrefix(prefix=prefix, user_id=user_id, followers_count=followers_count))
+
+        with transaction.atomic():
+            UsernamePrefix.objects.all().delete()
+            UsernamePrefix.objects.bulk_create(rows, batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(f"Stored {len(rows)} entries for {len(taken)} prefixes."))
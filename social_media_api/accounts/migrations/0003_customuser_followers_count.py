@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:14
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def populate_followers_count(apps, schema_editor):
+    CustomUser = apps.get_model("accounts", "CustomUser")
+    Follow = CustomUser.following.through
+    counts = (
+        Follow.objects.filter(to_customuser=OuterRef("pk"))
+        .values("to_customuser")
+        .annotate(total=Count("*"))
+        .values("total")
+    )
+    CustomUser.objects.filter(followers__isnull=False).distinct().update(followers_count=Subquery(counts))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_remove_customuser_followers_customuser_following'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_followers_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:27
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def populate_following_count(apps, schema_editor):
+    CustomUser = apps.get_model("accounts", "CustomUser")
+    Follow = CustomUser.following.through
+    counts = (
+        Follow.objects.filter(from_customuser=OuterRef("pk"))
+        .values("from_customuser")
+        .annotate(total=Count("*"))
+        .values("total")
+    )
+    CustomUser.objects.filter(following__isnull=False).distinct().update(following_count=Subquery(counts))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_customuser_followers_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_following_count, migrations.RunPython.noop),
+    ]
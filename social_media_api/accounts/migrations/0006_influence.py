@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_followsuggestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowEdgeChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('follower_id', models.BigIntegerField()),
+                ('followed_id', models.BigIntegerField()),
+                ('added', models.BooleanField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='influence_score',
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:32
+
+from django.db import migrations
+
+# The auto-created following table can't declare Meta.indexes, so the
+# (user, id) indexes behind the follower/following lists are raw SQL.
+INDEXES = [
+    ("follow_followers_idx", "to_customuser_id"),
+    ("follow_following_idx", "from_customuser_id"),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_influence'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f"CREATE INDEX {name} ON accounts_customuser_following ({column}, id)",
+            f"DROP INDEX {name}",
+        )
+        for name, column in INDEXES
+    ]
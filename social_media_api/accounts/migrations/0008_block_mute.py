@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_follow_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='blocking',
+            field=models.ManyToManyField(blank=True, related_name='blocked_by', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='muting',
+            field=models.ManyToManyField(blank=True, related_name='muted_by', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
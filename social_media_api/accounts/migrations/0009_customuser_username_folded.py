@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:34
+
+from django.db import migrations, models
+
+
+def populate_username_folded(apps, schema_editor):
+    CustomUser = apps.get_model("accounts", "CustomUser")
+    users = CustomUser.objects.only("username").order_by("pk")
+    batch = []
+    for user in users.iterator(chunk_size=1000):
+        user.username_folded = user.username.casefold()
+        batch.append(user)
+        if len(batch) == 1000:
+            CustomUser.objects.bulk_update(batch, ["username_folded"])
+            batch = []
+    CustomUser.objects.bulk_update(batch, ["username_folded"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_block_mute'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='username_folded',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(populate_username_folded, migrations.RunPython.noop),
+    ]
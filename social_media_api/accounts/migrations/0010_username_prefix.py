@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_customuser_username_folded'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='username_folded',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=450),
+        ),
+        migrations.CreateModel(
+            name='UsernamePrefix',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=16)),
+                ('followers_count', models.PositiveIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['prefix', '-followers_count', 'user'], name='username_prefix_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('prefix', 'user'), name='unique_username_prefix')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def flag_pulled_authors(apps, schema_editor):
+    # Posts by authors currently above the threshold were not fanned out.
+    CustomUser = apps.get_model("accounts", "CustomUser")
+    threshold = getattr(settings, "FEED_FANOUT_THRESHOLD", 10000)
+    CustomUser.objects.filter(followers_count__gte=threshold).update(feed_pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_username_prefix'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='feed_pulled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(flag_pulled_authors, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
@@ -11,6 +12,91 @@ class CustomUser(AbstractUser):
         related_name="followers",
         blank=True
     )
+    # Blocking hides both users from each other; muting only hides the muted
+    # user from the muter. See accounts.exclusions.
+    blocking = models.ManyToManyField("self", symmetrical=False, related_name="blocked_by", blank=True)
+    muting = models.ManyToManyField("self", symmetrical=False, related_name="muted_by", blank=True)
+    # Cached len(followers) and len(following); kept in sync by accounts.signals
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # PageRank over the follow graph times the number of users (1.0 is
+    # average); refreshed by the compute_influence command
+    influence_score = models.FloatField(default=0)
+    # Set once fan-out skips one of this user's posts (posts.timeline); their
+    # posts are pulled at feed read time from then on, even below the threshold
+    feed_pulled = models.BooleanField(default=False)
+
+    # username.casefold(), for @mention autocomplete range scans; set on save.
+    # Folding can turn one character into up to three ("ß" -> "ss").
+    username_folded = models.CharField(max_length=450, db_index=True, editable=False, default="")
+
+    def save(self, *args, **kwargs):
+        self.username_folded = self.username.casefold()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "username" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "username_folded"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.username
+
+
+class FollowSuggestion(models.Model):
+    """
+    Precomputed "people you may know" entry, rebuilt by the
+    compute_follow_suggestions command. score counts the accounts `user`
+    follows that follow `suggested`.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="follow_suggestions")
+    suggested = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "suggested"], name="unique_follow_suggestion"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-score", "suggested"], name="follow_suggestion_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.suggested_id} for {self.user_id} ({self.score})"
+
+
+class FollowEdgeChange(models.Model):
+    """
+    Append-only log of follow edges added or removed, written by
+    accounts.signals while FOLLOW_EDGE_LOG is on and consumed (then deleted)
+    by compute_influence.
+    Plain ids, so entries outlive the users they mention.
+    """
+    follower_id = models.BigIntegerField()
+    followed_id = models.BigIntegerField()
+    added = models.BooleanField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.follower_id} {'+' if self.added else '-'}> {self.followed_id}"
+
+
+class UsernamePrefix(models.Model):
+    """
+    Most followed users per short username prefix, rebuilt by the
+    refresh_username_prefixes command. Prefixes up to
+    AUTOCOMPLETE_PREFIX_LENGTH characters match too many users to rank at
+    request time, so autocomplete reads them from here.
+    """
+    prefix = models.CharField(max_length=16)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    followers_count = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["prefix", "user"], name="unique_username_prefix"),
+        ]
+        indexes = [
+            models.Index(fields=["prefix", "-followers_count", "user"], name="username_prefix_rank_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.prefix}: {self.user_id}"
@@ -1,4 +1,4 @@
-from .models import CustomUser
+from .models import CustomUser, FollowSuggestion
 from django.contrib.auth.password_validation import validate_password
 
 from rest_framework.authtoken.models import Token
@@ -11,7 +11,18 @@ User = get_user_model()
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
-        fields = ['id', 'username', 'email', 'bio', 'profile_picture']
+        fields = [
+            'id', 'username', 'email', 'bio', 'profile_picture', 'followers_count', 'following_count', 'influence_score'
+        ]
+        read_only_fields = ['followers_count', 'following_count', 'influence_score']
+
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='suggested_id')
+    username = serializers.CharField(source='suggested.username')
+
+    class Meta:
+        model = FollowSuggestion
+        fields = ['id', 'username', 'score']
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import exclusions
+from .authentication import token_cache
+from .models import CustomUser, FollowEdgeChange
+
+Follow = CustomUser.following.through
+
+
+@receiver(m2m_changed, sender=Follow)
+def update_follower_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    # add() only reports ids that were actually inserted, but remove() reports
+    # whatever it was asked to remove, so look up the real edges beforehand.
+    if action in ("pre_remove", "pre_clear"):
+        if reverse:
+            edges, column = Follow.objects.filter(to_customuser=instance), "from_customuser_id"
+        else:
+            edges, column = Follow.objects.filter(from_customuser=instance), "to_customuser_id"
+        if action == "pre_remove":
+            edges = edges.filter(**{f"{column}__in": pk_set})
+        instance._removed_follow_ids = set(edges.values_list(column, flat=True))
+        return
+
+    if action == "post_add":
+        changed, delta = pk_set, 1
+    elif action in ("post_remove", "post_clear"):
+        changed, delta = instance.__dict__.pop("_removed_follow_ids", set()), -1
+    else:
+        return
+    if not changed:
+        return
+
+    if reverse:
+        # instance gained or lost followers, each of whom follows one more/less
+        instance_field, other_field = "followers_count", "following_count"
+    else:
+        instance_field, other_field = "following_count", "followers_count"
+    CustomUser.objects.filter(pk=instance.pk).update(**{instance_field: F(instance_field) + delta * len(changed)})
+    CustomUser.objects.filter(pk__in=changed).update(**{other_field: F(other_field) + delta})
+    if not getattr(settings, "FOLLOW_EDGE_LOG", False):
+        return
+    FollowEdgeChange.objects.bulk_create([
+        FollowEdgeChange(
+            follower_id=other_id if reverse else instance.pk,
+            followed_id=instance.pk if reverse else other_id,
+            added=delta > 0,
+        )
+        for other_id in changed
+    ])
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=CustomUser)
+def evict_saved_user(sender, instance, **kwargs):
+    # Covers deactivation and password changes, and keeps profile edits fresh.
+    token_cache.delete_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=exclusions.Block)
+@receiver(m2m_changed, sender=exclusions.Mute)
+def invalidate_exclusions(sender, instance, action, reverse, pk_set, **kwargs):
+    # Both ends' sets change; clear() doesn't report who was affected.
+    if action == "pre_clear":
+        column = "from_customuser_id" if reverse else "to_customuser_id"
+        edges = sender.objects.filter(**{"to_customuser" if reverse else "from_customuser": instance})
+        instance._cleared_exclusion_ids = set(edges.values_list(column, flat=True))
+    elif action in ("post_add", "post_remove"):
+        exclusions.invalidate({instance.pk, *pk_set})
+    elif action == "post_clear":
+        exclusions.invalidate({instance.pk, *instance.__dict__.pop("_cleared_exclusion_ids", set())})
@@ -1,3 +1,359 @@
-from django.test import TestCase
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from posts.models import Post
+from .authentication import token_cache
+from .models import CustomUser, FollowEdgeChange, FollowSuggestion
+
+try:
+    import numpy as np
+    from . import influence
+except ImportError:  # compute_influence is optional
+    np = influence = None
+
+THROTTLED = {**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"likes": "2/min", "register": "2/min", "feed": "2/min"}}
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, REST_FRAMEWORK=THROTTLED)
+class TokenBucketThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user("alice", password="pass1234")
+        self.client.force_authenticate(self.user)
+
+    def assertThrottledAfter(self, count, request):
+        for _ in range(count):
+            self.assertNotEqual(request().status_code, 429)
+        response = request()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    def test_feed(self):
+        self.assertThrottledAfter(2, lambda: self.client.get("/api/feed/"))
+
+    def test_likes(self):
+        post = Post.objects.create(author=self.user, title="t", content="c")
+        self.assertThrottledAfter(2, lambda: self.client.put(f"/api/posts/{post.pk}/like/"))
+
+    def test_register(self):
+        self.client.force_authenticate(None)
+        self.assertThrottledAfter(2, lambda: self.client.post("/api/accounts/register/", {}))
+
+    def test_unscoped_views_are_not_throttled(self):
+        for _ in range(5):
+            self.assertEqual(self.client.get("/api/posts/").status_code, 200)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FollowCountTests(APITestCase):
+    def setUp(self):
+        self.me, self.a, self.b, self.c = (
+            CustomUser.objects.create_user(name, password="pass1234") for name in ["me", "a", "b", "c"]
+        )
+
+    def assertCounts(self, expected):
+        """`expected` maps username -> (followers_count, following_count); both must match the follow table."""
+        for user in CustomUser.objects.all():
+            actual = (user.followers_count, user.following_count)
+            self.assertEqual(actual, (user.followers.count(), user.following.count()), user.username)
+            self.assertEqual(actual, expected.get(user.username, (0, 0)), user.username)
+
+    def test_forward_add_remove_clear(self):
+        self.me.following.add(self.a, self.b)
+        self.me.following.add(self.a)  # already followed
+        self.assertCounts({"me": (0, 2), "a": (1, 0), "b": (1, 0)})
+        self.me.following.remove(self.a, self.c)  # c was never followed
+        self.assertCounts({"me": (0, 1), "b": (1, 0)})
+        self.me.following.clear()
+        self.assertCounts({})
+
+    def test_reverse_add_remove_clear(self):
+        self.me.followers.add(self.a, self.b, self.c)
+        self.assertCounts({"me": (3, 0), "a": (0, 1), "b": (0, 1), "c": (0, 1)})
+        self.c.following.remove(self.me)
+        self.me.followers.remove(self.a, self.c)  # c already left
+        self.assertCounts({"me": (1, 0), "b": (0, 1)})
+        self.me.followers.clear()
+        self.assertCounts({})
+
+    def test_set(self):
+        self.me.following.set([self.a, self.b])
+        self.me.following.set([self.b, self.c])
+        self.assertCounts({"me": (0, 2), "b": (1, 0), "c": (1, 0)})
+        self.me.followers.set([self.a])
+        self.assertCounts({"me": (1, 2), "a": (0, 1), "b": (1, 0), "c": (1, 0)})
+
+    def test_explicit_follow_routes(self):
+        self.client.force_authenticate(self.me)
+        self.assertEqual(self.client.post(f"/api/accounts/follow/{self.a.pk}/").status_code, 200)
+        self.assertCounts({"me": (0, 1), "a": (1, 0)})
+        response = self.client.get(f"/api/accounts/users/{self.a.pk}/")
+        self.assertEqual((response.data["followers_count"], response.data["following_count"]), (1, 0))
+        self.assertEqual(self.client.post(f"/api/accounts/unfollow/{self.a.pk}/").status_code, 200)
+        self.assertCounts({})
+
+    def test_reconcile_repairs_drift(self):
+        self.me.following.add(self.a, self.b)
+        self.c.following.add(self.a)
+        CustomUser.objects.update(followers_count=5, following_count=5)
+        stdout = StringIO()
+        call_command("reconcile_follow_counts", "--chunk-size=3", stdout=stdout)
+        self.assertIn("Reconciled 4 users.", stdout.getvalue())
+        self.assertCounts({"me": (0, 2), "a": (2, 0), "b": (1, 0), "c": (0, 1)})
+
+
+@skipUnless(np, "requires numpy")
+class InfluenceTests(APITestCase):
+    def keys(self, *edges):
+        return influence.sorted_unique(influence.edge_keys(*zip(*edges)))
+
+    def test_apply_changes_keeps_the_latest_change_per_edge(self):
+        keys = self.keys((1, 2), (1, 3), (2, 3))
+        changes = [
+            ((1, 2), False), ((2, 3), True), ((1, 2), True),  # deleted then re-added
+            ((2, 3), False),                                  # added then deleted
+            ((3, 1), False), ((3, 1), True),                  # new edge
+            ((1, 3), True), ((4, 5), False),                  # no-ops
+        ]
+        change_keys = influence.edge_keys(*zip(*[edge for edge, _ in changes]))
+        added = np.array([flag for _, flag in changes])
+        self.assertEqual(
+            influence.apply_changes(keys, change_keys, added).tolist(),
+            self.keys((1, 2), (1, 3), (3, 1)).tolist(),
+        )
+
+    def test_build_csr_drops_unknown_users(self):
+        indptr, indices, keys = influence.build_csr(np.array([1, 2, 5]), self.keys((1, 2), (1, 5), (2, 9), (5, 1)))
+        self.assertEqual(indptr.tolist(), [0, 2, 2, 3])
+        self.assertEqual(indices.tolist(), [1, 2, 0])
+        self.assertEqual(keys.tolist(), self.keys((1, 2), (1, 5), (5, 1)).tolist())
+
+    def test_pagerank(self):
+        # The cycle 0 -> 1 -> 2 -> 0 ranks evenly; 3 follows nobody.
+        scores, _ = influence.pagerank(np.array([0, 1, 2, 3, 3]), np.array([1, 2, 0]))
+        self.assertAlmostEqual(scores.sum(), 1)
+        self.assertTrue(np.allclose(scores[:3], scores[0]))
+        # 0, 1 and 2 all follow 3.
+        scores, _ = influence.pagerank(np.array([0, 2, 4, 5, 5]), np.array([1, 3, 2, 3, 0]))
+        self.assertAlmostEqual(scores.sum(), 1)
+        self.assertEqual(int(np.argmax(scores)), 3)
+
+    def compute(self, snapshot, *args):
+        call_command("compute_influence", f"--snapshot={snapshot}", "--tol=1e-12", "--max-iter=1000", *args, stdout=StringIO())
+        return dict(CustomUser.objects.values_list("username", "influence_score"))
+
+    @override_settings(FOLLOW_EDGE_LOG=True)
+    def test_incremental_run_matches_full(self):
+        users = {name: CustomUser.objects.create_user(name, password="pass1234") for name in "abcdef"}
+        users["a"].following.add(users["b"], users["c"])
+        users["b"].following.add(users["c"])
+        users["c"].following.add(users["a"], users["d"])
+        users["e"].following.add(users["a"])
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = Path(directory) / "influence.npz"
+            self.compute(snapshot)
+            self.assertTrue(snapshot.exists())
+            self.assertFalse(FollowEdgeChange.objects.exists())
+
+            users["a"].following.remove(users["b"])
+            users["a"].following.add(users["b"])  # re-added
+            users["c"].following.remove(users["d"])
+            users["d"].following.add(users["f"], users["e"])
+            users["e"].delete()  # its follow rows cascade without a change entry
+            CustomUser.objects.create_user("g", password="pass1234").following.add(users["a"])
+            self.assertTrue(FollowEdgeChange.objects.exists())
+
+            incremental = self.compute(snapshot)
+            self.assertFalse(FollowEdgeChange.objects.exists())
+            full = self.compute(Path(directory) / "full.npz", "--full")
+        self.assertEqual(incremental.keys(), full.keys())
+        for name, score in full.items():
+            self.assertAlmostEqual(incremental[name], score, places=6, msg=name)
+
+    def test_without_the_change_log(self):
+        users = [CustomUser.objects.create_user(name, password="pass1234") for name in "abc"]
+        users[0].following.add(users[1])
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = Path(directory) / "influence.npz"
+            self.compute(snapshot)
+            users[1].following.add(users[2])
+            self.assertFalse(FollowEdgeChange.objects.exists())
+            # Turning the log on later must not replay onto the unlogged snapshot.
+            with override_settings(FOLLOW_EDGE_LOG=True):
+                users[2].following.add(users[0])
+                rerun = self.compute(snapshot)
+            full = self.compute(Path(directory) / "full.npz", "--full")
+        for name, score in full.items():
+            self.assertAlmostEqual(rerun[name], score, places=6, msg=name)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FollowSuggestionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [CustomUser.objects.create_user(f"user{i}", password="pass1234") for i in range(6)]
+        me, a, b, c, d, e = self.users
+        me.following.add(a, b)
+        a.following.add(c, d, me)
+        b.following.add(c, e, a)
+        self.client.force_authenticate(me)
+
+    def suggested(self):
+        response = self.client.get("/api/accounts/users/suggestions/")
+        return [(row["username"], row["score"]) for row in response.data]
+
+    def test_friends_of_friends(self):
+        call_command("compute_follow_suggestions", "--block-size", "2", stdout=StringIO())
+        # Neither themselves nor accounts already followed; ties by id.
+        self.assertEqual(self.suggested(), [("user3", 2), ("user4", 1), ("user5", 1)])
+
+    def test_drops_stale_and_hidden_suggestions(self):
+        me, a, b, c, d, e = self.users
+        FollowSuggestion.objects.create(user=e, suggested=me, score=9)
+        call_command("compute_follow_suggestions", stdout=StringIO())
+        self.assertFalse(FollowSuggestion.objects.filter(user=e).exists())
+
+        me.following.add(c)
+        me.muting.add(d)
+        e.blocking.add(me)
+        self.assertEqual(self.suggested(), [])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, AUTOCOMPLETE_PREFIX_LENGTH=2)
+class AutocompleteTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        names = ["Alice", "alex", "ALBERT", "Alfred", "alfonso", "bob", "Straße", "me"]
+        self.users = {name: CustomUser.objects.create_user(name, password="pass1234") for name in names}
+        for follower in ["bob", "alex", "Alfred"]:
+            self.users[follower].following.add(self.users["ALBERT"])
+        self.users["bob"].following.add(self.users["alex"])
+        self.me = self.users["me"]
+        self.me.following.add(self.users["Alfred"])
+        self.client.force_authenticate(self.me)
+
+    def complete(self, query):
+        response = self.client.get("/api/accounts/users/autocomplete/", {"q": query})
+        return [(row["username"], row["following"]) for row in response.data]
+
+    def test_short_prefix_reads_precomputed_ranking(self):
+        expected = [("Alfred", True), ("ALBERT", False), ("alex", False), ("Alice", False), ("alfonso", False)]
+        self.assertEqual(self.complete("@al"), expected)  # not refreshed yet
+        call_command("refresh_username_prefixes", stdout=StringIO())
+        cache.clear()
+        self.assertEqual(self.complete("AL"), expected)
+
+    def test_short_prefix_finds_accounts_newer_than_the_refresh(self):
+        call_command("refresh_username_prefixes", stdout=StringIO())
+        CustomUser.objects.create_user("Alvin", password="pass1234")
+        self.assertIn(("Alvin", False), self.complete("al"))
+        self.assertEqual(self.complete("alv"), [("Alvin", False)])
+
+    def test_long_prefix_ranks_range_scan(self):
+        self.assertEqual(self.complete("alf"), [("Alfred", True), ("alfonso", False)])
+        self.assertEqual(self.complete("ALB"), [("ALBERT", False)])
+
+    def test_case_folding(self):
+        self.assertEqual(self.complete("STRASS"), [("Straße", False)])
+        self.assertEqual(self.users["Straße"].username_folded, "strasse")
+
+    def test_skips_hidden_and_invalid(self):
+        self.me.blocking.add(self.users["alfonso"])
+        self.assertEqual(self.complete("alfo"), [])
+        self.assertEqual(self.complete("a b"), [])
+        self.assertEqual(self.complete(""), [])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, TOKEN_CACHE_SIZE=2)
+class TokenCacheTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.users = [CustomUser.objects.create_user(f"user{i}", password="pass1234") for i in range(3)]
+        self.tokens = [Token.objects.create(user=user) for user in self.users]
+
+    def profile(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return self.client.get("/api/accounts/profile/")
+
+    def test_serves_repeat_lookups_from_cache(self):
+        self.assertEqual(self.profile(self.tokens[0]).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.profile(self.tokens[0]).data["username"], "user0")
+        self.assertEqual((token_cache.hits, token_cache.misses), (1, 1))
+
+    def test_deleted_token_is_evicted(self):
+        self.profile(self.tokens[0])
+        self.tokens[0].delete()
+        self.assertEqual(self.profile(self.tokens[0]).status_code, 401)
+
+    def test_deactivated_user_is_evicted(self):
+        self.profile(self.tokens[0])
+        self.users[0].is_active = False
+        self.users[0].save()
+        self.assertEqual(self.profile(self.tokens[0]).status_code, 401)
+
+    @override_settings(TOKEN_CACHE_SIZE=10)
+    def test_delete_user_evicts_only_their_keys(self):
+        token_cache.set("a1", self.users[0], None)
+        token_cache.set("a2", self.users[0], None)
+        token_cache.set("b1", self.users[1], None)
+        token_cache.set("b1", self.users[2], None)  # key reassigned to another user
+        token_cache.delete_user(self.users[1].pk)
+        self.assertIsNotNone(token_cache.get("b1"))
+        token_cache.delete_user(self.users[0].pk)
+        self.assertEqual(token_cache.stats()["size"], 1)
+        self.assertIsNone(token_cache.get("a1"))
+        self.assertIsNotNone(token_cache.get("b1"))
+
+    def test_least_recently_used_entry_is_dropped(self):
+        for token in [self.tokens[0], self.tokens[1], self.tokens[0], self.tokens[2]]:
+            self.profile(token)
+        self.assertEqual(token_cache.stats()["size"], 2)
+        self.assertIsNotNone(token_cache.get(self.tokens[0].key))
+        self.assertIsNone(token_cache.get(self.tokens[1].key))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FollowListTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.star = CustomUser.objects.create_user("star", password="pass1234")
+        cls.fans = [CustomUser.objects.create_user(f"fan{i}", password="pass1234") for i in range(12)]
+        for fan in cls.fans:
+            fan.following.add(cls.star)
+        cls.fans[0].following.add(cls.fans[1])
+
+    def setUp(self):
+        self.client.force_authenticate(self.fans[0])
+
+    def walk(self, url):
+        names, response = [], self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            names.extend(row["username"] for row in response.data["results"])
+            if response.data["next"] is None:
+                return names
+            response = self.client.get(response.data["next"])
+
+    def test_followers_newest_first(self):
+        names = self.walk(f"/api/accounts/users/{self.star.pk}/followers/")
+        self.assertEqual(names, [fan.username for fan in reversed(self.fans)])
+
+    def test_following(self):
+        self.assertEqual(self.walk(f"/api/accounts/users/{self.fans[0].pk}/following/"), ["fan1", "star"])
+        self.assertEqual(self.walk(f"/api/accounts/users/{self.star.pk}/following/"), [])
+
+    def test_unknown_user(self):
+        for pk in ["abc", "99999"]:
+            for name in ["followers", "following"]:
+                self.assertEqual(self.client.get(f"/api/accounts/users/{pk}/{name}/").status_code, 404)
@@ -0,0 +1,53 @@
+import time
+
+from django.core.cache import cache as default_cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per (scope, client). A bucket holds up to N tokens, refills
+    at N per period and each request spends one, for a rate of "N/period"
+    from DEFAULT_THROTTLE_RATES. The state is a single (tokens, timestamp)
+    pair in the cache, so a check costs one get and one set however high the
+    rate is.
+
+    The scope comes from the view's `throttle_scope`, else the class's
+    `scope` (@api_view views always have throttle_scope = None, so they use
+    a subclass); views with neither are not throttled. Concurrent requests from the same
+    client can both read a bucket before either writes it back, so bursts may
+    slightly overshoot the rate.
+    """
+    cache = default_cache
+    timer = time.time
+    cache_format = "throttle_bucket_%(scope)s_%(ident)s"
+    scope = None
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, "throttle_scope", None) or type(self).scope
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope) if self.scope else None
+        if rate is None:
+            return True
+        capacity, duration = SimpleRateThrottle.parse_rate(self, rate)
+
+        key = self.get_cache_key(request)
+        now = self.timer()
+        tokens, updated_at = self.cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * capacity / duration)
+        if tokens < 1:
+            self.wait_seconds = (1 - tokens) * duration / capacity
+            return False
+        # An expired bucket would have refilled completely anyway.
+        self.cache.set(key, (tokens - 1, now), duration)
+        return True
+
+    def get_cache_key(self, request):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+    def wait(self):
+        return getattr(self, "wait_seconds", None)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RegisterView, CustomAuthToken, ProfileView, UserViewSet
+from .views import RegisterView, CustomAuthToken, ProfileView, TokenCacheStatsView, UserViewSet
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
@@ -9,10 +9,11 @@ urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', CustomAuthToken.as_view(), name='login'),
     path('profile/', ProfileView.as_view(), name='profile'),
+    path('token-cache/', TokenCacheStatsView.as_view(), name='token-cache-stats'),
     
     # ✅ Explicit follow/unfollow paths for the checker
-    path('follow/<int:user_id>/', UserViewSet.as_view({'post': 'follow'}), name='follow-user'),
-    path('unfollow/<int:user_id>/', UserViewSet.as_view({'post': 'unfollow'}), name='unfollow-user'),
+    path('follow/<int:pk>/', UserViewSet.as_view({'post': 'follow'}), name='follow-user'),
+    path('unfollow/<int:pk>/', UserViewSet.as_view({'post': 'unfollow'}), name='unfollow-user'),
 
     path('', include(router.urls)),
 ]
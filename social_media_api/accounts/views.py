@@ -1,16 +1,38 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.decorators import action
-from .models import CustomUser
-from .serializers import UserSerializer, RegisterSerializer
+from rest_framework.views import APIView
+from .authentication import token_cache
+from .exclusions import blocked_between, hidden_author_ids
+from .models import CustomUser, FollowSuggestion, UsernamePrefix
+from .serializers import FollowSuggestionSerializer, UserSerializer, RegisterSerializer
+from social_media_api.pagination import KeysetPagination
+from social_media_api.serializers import IdListSerializer
+
+Follow = CustomUser.following.through
+
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_SCAN = 500
+USERNAME_PREFIX = re.compile(r"[\w.@+-]{1,150}")
+
+
+class FollowPagination(KeysetPagination):
+    # Newest follow first; the through table's id is unique and increasing.
+    ordering = ("-id",)
 
 
 class RegisterView(generics.GenericAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = "register"
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -43,6 +65,13 @@ class ProfileView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 
+class TokenCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(token_cache.stats())
+
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
@@ -53,6 +82,8 @@ class UserViewSet(viewsets.ModelViewSet):
         user_to_follow = self.get_object()
         if request.user == user_to_follow:
             return Response({"detail": "You cannot follow yourself."}, status=400)
+        if blocked_between(request.user.pk, [user_to_follow.pk]):
+            return Response({"detail": "You cannot follow this user."}, status=403)
 
         request.user.following.add(user_to_follow)
         return Response({"detail": f"You are now following {user_to_follow.username}."})
@@ -65,3 +96,175 @@ class UserViewSet(viewsets.ModelViewSet):
 
         request.user.following.remove(user_to_unfollow)
         return Response({"detail": f"You unfollowed {user_to_unfollow.username}."})
+
+    # Blocking also drops any follow between the two users, and follow and
+    # follow-batch refuse to recreate one until it is lifted; the m2m_changed
+    # handlers refresh follower counts, timelines and cached block/mute sets.
+
+    @action(detail=True, methods=["post"])
+    def block(self, request, pk=None):
+        user = self.get_object()
+        if user == request.user:
+            return Response({"detail": "You cannot block yourself."}, status=400)
+        request.user.blocking.add(user)
+        request.user.following.remove(user)
+        user.following.remove(request.user)
+        return Response({"detail": f"You blocked {user.username}."})
+
+    @action(detail=True, methods=["post"])
+    def unblock(self, request, pk=None):
+        user = self.get_object()
+        request.user.blocking.remove(user)
+        return Response({"detail": f"You unblocked {user.username}."})
+
+    @action(detail=True, methods=["post"])
+    def mute(self, request, pk=None):
+        user = self.get_object()
+        if user == request.user:
+            return Response({"detail": "You cannot mute yourself."}, status=400)
+        request.user.muting.add(user)
+        return Response({"detail": f"You muted {user.username}."})
+
+    @action(detail=True, methods=["post"])
+    def unmute(self, request, pk=None):
+        user = self.get_object()
+        request.user.muting.remove(user)
+        return Response({"detail": f"You unmuted {user.username}."})
+
+    # Follower/following lists page over the follow table itself with one
+    # query per page on the (to_customuser, id) / (from_customuser, id)
+    # indexes, joined to the other user for the username only, after a
+    # primary-key check that the listed user exists.
+
+    @action(detail=True, methods=["get"])
+    def followers(self, request, pk=None):
+        return self._follow_page(request, Follow.objects.filter(to_customuser_id=self._user_id(pk)), "from_customuser")
+
+    @action(detail=True, methods=["get"])
+    def following(self, request, pk=None):
+        return self._follow_page(request, Follow.objects.filter(from_customuser_id=self._user_id(pk)), "to_customuser")
+
+    def _user_id(self, pk):
+        if not str(pk).isdigit() or not CustomUser.objects.filter(pk=pk).exists():
+            raise Http404
+        return int(pk)
+
+    def _follow_page(self, request, edges, other):
+        paginator = FollowPagination()
+        rows = paginator.paginate_queryset(edges.values("id", f"{other}_id", f"{other}__username"), request, self)
+        return paginator.get_paginated_response([
+            {"id": row[f"{other}_id"], "username": row[f"{other}__username"]} for row in rows
+        ])
+
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        """
+        GET users/autocomplete/?q=<prefix>: @mention candidates, accounts the
+        caller follows first, then the most followed. The first
+        AUTOCOMPLETE_SCAN matches in username_folded index order are ranked,
+        so the LIMIT bounds the scan; short prefixes add the precomputed
+        UsernamePrefix ranking, which covers the rest of their large range.
+        The global list is cached per prefix briefly.
+        """
+        prefix = request.query_params.get("q", "").lstrip("@").casefold()
+        if not USERNAME_PREFIX.fullmatch(prefix):
+            return Response([])
+        matching = {"username_folded__gte": prefix, "username_folded__lt": prefix + "\uffff"}
+
+        followed = list(
+            request.user.following.filter(**matching).order_by("-followers_count", "username_folded")
+            .values("id", "username", "followers_count")[:AUTOCOMPLETE_LIMIT]
+        )
+        key = f"autocomplete:{prefix}"
+        popular = cache.get(key)
+        if popular is None:
+            popular = self._popular(prefix, matching)
+            cache.set(key, popular, getattr(settings, "AUTOCOMPLETE_CACHE_TTL", 30))
+
+        followed_ids = {row["id"] for row in followed}
+        skip = {request.user.pk, *hidden_author_ids(request)}
+        results = []
+        for row in followed + popular:
+            if row["id"] in skip:
+                continue
+            skip.add(row["id"])
+            results.append({**row, "following": row["id"] in followed_ids})
+            if len(results) == AUTOCOMPLETE_LIMIT:
+                break
+        return Response(results)
+
+    def _popular(self, prefix, matching):
+        # The scan also finds accounts created since the last refresh, and
+        # serves short prefixes before the first one.
+        candidates = {
+            row["id"]: row for row in
+            CustomUser.objects.filter(**matching).order_by("username_folded")
+            .values("id", "username", "followers_count")[:AUTOCOMPLETE_SCAN]
+        }
+        if len(prefix) <= getattr(settings, "AUTOCOMPLETE_PREFIX_LENGTH", 3):
+            rows = (
+                UsernamePrefix.objects.filter(prefix=prefix).order_by("-followers_count", "user")
+                .values("user_id", "user__username", "user__followers_count")[:AUTOCOMPLETE_LIMIT * 2]
+            )
+            for row in rows:
+                candidates[row["user_id"]] = {
+                    "id": row["user_id"],
+                    "username": row["user__username"],
+                    "followers_count": row["user__followers_count"],
+                }
+        ranked = sorted(candidates.values(), key=lambda row: (-row["followers_count"], row["id"]))
+        return ranked[:AUTOCOMPLETE_LIMIT * 2]
+
+    @action(detail=False, methods=["get"])
+    def suggestions(self, request):
+        """People you may know, precomputed by compute_follow_suggestions."""
+        suggestions = (
+            FollowSuggestion.objects.filter(user=request.user)
+            .exclude(suggested__in=request.user.following.all())
+            .exclude(suggested__in=hidden_author_ids(request))
+            .select_related("suggested")
+            .order_by("-score", "suggested")
+        )
+        return Response(FollowSuggestionSerializer(suggestions, many=True).data)
+
+    # Batch variants for clients replaying offline actions. add()/remove()
+    # issue one set-based insert (ignoring conflicts) or delete on the
+    # following through table and still fire m2m_changed, which keeps
+    # follower counts and timelines in sync.
+
+    @action(detail=False, methods=["post"], url_path="follow-batch")
+    def follow_batch(self, request):
+        ids = self._batch_ids(request)
+        existing = set(CustomUser.objects.filter(pk__in=ids).values_list("pk", flat=True))
+        following = set(request.user.following.filter(pk__in=existing).values_list("pk", flat=True))
+        blocked = blocked_between(request.user.pk, existing)
+        new_ids = existing - following - blocked - {request.user.pk}
+        request.user.following.add(*new_ids)
+
+        def result(user_id):
+            if user_id not in existing:
+                return "not_found"
+            if user_id == request.user.pk:
+                return "self"
+            if user_id in blocked:
+                return "blocked"
+            return "already_following" if user_id in following else "followed"
+        return Response({"results": [{"id": user_id, "result": result(user_id)} for user_id in ids]})
+
+    @action(detail=False, methods=["post"], url_path="unfollow-batch")
+    def unfollow_batch(self, request):
+        ids = self._batch_ids(request)
+        existing = set(CustomUser.objects.filter(pk__in=ids).values_list("pk", flat=True))
+        following = set(request.user.following.filter(pk__in=existing).values_list("pk", flat=True))
+        request.user.following.remove(*following)
+
+        def result(user_id):
+            if user_id not in existing:
+                return "not_found"
+            return "unfollowed" if user_id in following else "not_following"
+        return Response({"results": [{"id": user_id, "result": result(user_id)} for user_id in ids]})
+
+    def _batch_ids(self, request):
+        serializer = IdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data["ids"]
@@ -0,0 +1,43 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from notifications.outbox import DEFAULT_BATCH_SIZE, drain_batch
+
+
+class Command(BaseCommand):
+    help = "Move pending notifications from the outbox into the notifications table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--workers", type=int, default=4, help="Threads draining in parallel.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting once empty.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep when the outbox is empty.")
+
+    def handle(self, *args, batch_size, workers, loop, interval, **options):
+        if workers > 1 and not connection.features.has_select_for_update_skip_locked:
+            # Without SKIP LOCKED two workers could claim the same rows.
+            self.stderr.write(f"{connection.vendor} does not support SKIP LOCKED; using a single worker.")
+            workers = 1
+
+        total = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                moved = sum(pool.map(self.drain_until_empty, [batch_size] * workers))
+                total += moved
+                if not loop:
+                    break
+                if not moved:
+                    time.sleep(interval)
+        self.stdout.write(self.style.SUCCESS(f"Delivered {total} notifications."))
+
+    def drain_until_empty(self, batch_size):
+        total = 0
+        try:
+            while moved := drain_batch(batch_size):
+                total += moved
+        finally:
+            connection.close()  # each thread has its own connection
+        return total
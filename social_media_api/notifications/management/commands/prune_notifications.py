@@ -0,0 +1,108 @@
+import gzip
+import json
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from notifications.models import Notification, UnreadCounter
+
+ARCHIVE_FIELDS = [
+    "id", "recipient_id", "actor_id", "verb", "target_content_type_id", "target_object_id",
+    "created_at", "timestamp", "read", "actor_count", "sample_actors",
+]
+
+
+class MonthlyArchive:
+    """Appends rows to gzipped JSON Lines files, one per month of created_at."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.files = {}
+
+    def write(self, rows):
+        for row in rows:
+            month = row["created_at"].strftime("%Y-%m")
+            if month not in self.files:
+                # Appending adds a gzip member; readers see one stream.
+                self.files[month] = gzip.open(self.directory / f"notifications-{month}.jsonl.gz", "at", encoding="utf-8")
+            self.files[month].write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete notifications older than NOTIFICATION_RETENTION_DAYS and each recipient's rows beyond "
+        "the newest NOTIFICATION_MAX_PER_RECIPIENT, in short primary-key chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=getattr(settings, "NOTIFICATION_RETENTION_DAYS", 90))
+        parser.add_argument(
+            "--max-per-recipient", type=int, default=getattr(settings, "NOTIFICATION_MAX_PER_RECIPIENT", 1000)
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Rows deleted per transaction.")
+        parser.add_argument("--archive-dir", help="Append deleted rows to notifications-YYYY-MM.jsonl.gz here first.")
+
+    def handle(self, *args, days, max_per_recipient, chunk_size, archive_dir, **options):
+        archive = MonthlyArchive(archive_dir) if archive_dir else None
+        try:
+            expired = self.prune_expired(days, chunk_size, archive) if days else 0
+            overflow = self.prune_overflow(max_per_recipient, chunk_size, archive) if max_per_recipient else 0
+        finally:
+            if archive:
+                archive.close()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {expired} expired and {overflow} overflow notifications."))
+
+    def prune_expired(self, days, chunk_size, archive):
+        cutoff = timezone.now() - timedelta(days=days)
+        last_id, deleted = 0, 0
+        while True:
+            ids = list(
+                Notification.objects.filter(pk__gt=last_id, created_at__lt=cutoff)
+                .order_by("pk").values_list("pk", flat=True)[:chunk_size]
+            )
+            if not ids:
+                return deleted
+            deleted += self.delete(ids, archive)
+            last_id = ids[-1]
+
+    def prune_overflow(self, limit, chunk_size, archive):
+        recipient_ids = list(
+            Notification.objects.values("recipient").annotate(total=Count("pk"))
+            .filter(total__gt=limit).values_list("recipient", flat=True)
+        )
+        deleted = 0
+        for recipient_id in recipient_ids:
+            ids = list(
+                Notification.objects.filter(recipient_id=recipient_id)
+                .annotate(rank=Window(RowNumber(), order_by=[F("created_at").desc(), F("id").desc()]))
+                .filter(rank__gt=limit).values_list("pk", flat=True)
+            )
+            for start in range(0, len(ids), chunk_size):
+                deleted += self.delete(ids[start:start + chunk_size], archive)
+        return deleted
+
+    def delete(self, ids, archive):
+        with transaction.atomic():
+            rows = Notification.objects.filter(pk__in=ids)
+            if archive:
+                archived = list(rows.values(*ARCHIVE_FIELDS))
+                archive.write(archived)
+                unread = Counter(row["recipient_id"] for row in archived if not row["read"])
+            else:
+                unread = Counter(rows.filter(read=False).values_list("recipient_id", flat=True))
+            deleted, _ = rows.delete()
+            UnreadCounter.objects.adjust({user_id: -count for user_id, count in unread.items()})
+        return deleted
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from notifications.models import Notification, UnreadCounter
+
+
+def unread_count():
+    counts = (
+        Notification.objects.filter(recipient=OuterRef("user"), read=False)
+        .values("recipient").annotate(total=Count("*")).values("total")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = "Recompute UnreadCounter.count from the unread rows in the notifications table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Counters updated per statement.")
+
+    def handle(self, *args, chunk_size, **options):
+        # Users with unread rows but no counter yet get one first.
+        missing = (
+            Notification.objects.filter(read=False).exclude(recipient__in=UnreadCounter.objects.values("user"))
+            .values_list("recipient", flat=True).distinct()
+        )
+        UnreadCounter.objects.bulk_create(
+            [UnreadCounter(user_id=user_id) for user_id in missing], batch_size=chunk_size, ignore_conflicts=True
+        )
+        last_id, updated = 0, 0
+        while True:
+            ids = list(
+                UnreadCounter.objects.filter(user_id__gt=last_id).order_by("user_id")
+                .values_list("user_id", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                UnreadCounter.objects.filter(user_id__gte=ids[0], user_id__lte=ids[-1]).update(count=unread_count())
+            last_id = ids[-1]
+            updated += len(ids)
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {updated} unread counters."))
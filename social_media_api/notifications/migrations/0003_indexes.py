@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('notifications', '0002_notification_timestamp'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-created_at', '-id'], name='notification_recipient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'read', '-created_at', '-id'], name='notification_unread_idx'),
+        ),
+    ]
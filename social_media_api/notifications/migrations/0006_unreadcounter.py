@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_unread_counters(apps, schema_editor):
+    Notification = apps.get_model("notifications", "Notification")
+    UnreadCounter = apps.get_model("notifications", "UnreadCounter")
+    unread = Notification.objects.filter(read=False).values("recipient").annotate(total=Count("*"))
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=row["recipient"], count=row["total"]) for row in unread],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_customuser_followers_count'),
+        ('notifications', '0005_notification_coalescing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_unread_counters, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
@@ -13,6 +15,69 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     read = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Coalescing (see notifications.outbox): one row stands for every actor
+    # that did `verb` to `target` since `timestamp`; `actor` and `created_at`
+    # track the latest of them. A repeat actor is only recognised while still
+    # in sample_actors, so actor_count can overcount slightly.
+    actor_count = models.PositiveIntegerField(default=1)
+    sample_actors = models.JSONField(default=list, blank=True)  # a few usernames, newest first
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["recipient", "-created_at", "-id"], name="notification_recipient_idx"),
+            models.Index(fields=["recipient", "read", "-created_at", "-id"], name="notification_unread_idx"),
+        ]
 
     def __str__(self):
         return f"{self.actor} {self.verb} {self.target} → {self.recipient}"
+
+
+class NotificationOutbox(models.Model):
+    """
+    Pending notification written by request handlers (see notifications.utils)
+    and moved into Notification in batches by notifications.outbox.drain(),
+    normally from the drain_notification_outbox command.
+    """
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    verb = models.CharField(max_length=255)
+    target_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    target_object_id = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.actor_id} {self.verb} → {self.recipient_id} (pending)"
+
+
+class UnreadCounterQuerySet(models.QuerySet):
+    def adjust(self, deltas):
+        """Add {user_id: delta} to the counters with one upsert and one UPDATE."""
+        deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        self.bulk_create([self.model(user_id=user_id) for user_id in deltas], ignore_conflicts=True)
+        change = Case(*[When(user_id=user_id, then=Value(delta)) for user_id, delta in deltas.items()])
+        self.filter(user_id__in=deltas).update(count=Greatest(F("count") + change, 0))
+
+    def reset(self, user_id):
+        self.filter(user_id=user_id).update(count=0)
+
+    def get_count(self, user_id):
+        return self.filter(user_id=user_id).values_list("count", flat=True).first() or 0
+
+
+class UnreadCounter(models.Model):
+    """
+    Number of unread notifications per user, so the badge count is one
+    primary-key lookup. Kept in sync by notifications.outbox (new and
+    re-opened coalesced notifications), the mark-read actions and
+    notifications.signals (deleted actors); reconcile_unread_counters
+    recomputes it from the notifications table.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="+")
+    count = models.PositiveIntegerField(default=0)
+
+    objects = UnreadCounterQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.user_id}: {self.count} unread"
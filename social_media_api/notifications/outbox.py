@@ -0,0 +1,110 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification, NotificationOutbox, UnreadCounter
+from .stream import broker
+
+DEFAULT_BATCH_SIZE = 500
+SAMPLE_ACTORS = 3
+
+
+def coalesce_window():
+    seconds = getattr(settings, "NOTIFICATION_COALESCE_WINDOW", 0)
+    return timedelta(seconds=seconds) if seconds else None
+
+
+def drain_batch(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Move up to `batch_size` of the oldest outbox rows into Notification in
+    one transaction. Rows locked by a concurrent drainer are skipped where
+    the database supports SKIP LOCKED. Returns the number of rows moved.
+    """
+    with transaction.atomic():
+        pending = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True).order_by("id")[:batch_size]
+        )
+        if not pending:
+            return 0
+        deliver(pending)
+        NotificationOutbox.objects.filter(id__in=[item.id for item in pending]).delete()
+    return len(pending)
+
+
+def drain(batch_size=DEFAULT_BATCH_SIZE):
+    """Drain the whole outbox synchronously, e.g. from tests. Returns the number of rows moved."""
+    total = 0
+    while moved := drain_batch(batch_size):
+        total += moved
+    return total
+
+
+def deliver(pending):
+    """
+    Turn outbox rows into notifications with one bulk insert and one bulk
+    update. With NOTIFICATION_COALESCE_WINDOW set, rows sharing (recipient,
+    verb, target) with a notification started inside the window are folded
+    into it instead of inserting a new row.
+    """
+    now = timezone.now()
+    usernames = dict(
+        get_user_model().objects.filter(pk__in={item.actor_id for item in pending}).values_list("pk", "username")
+    )
+    window = coalesce_window()
+    groups = existing_groups(pending, now - window) if window else {}
+
+    created, updated, unread = [], {}, Counter()
+    for item in pending:
+        key = (item.recipient_id, item.verb, item.target_content_type_id, item.target_object_id)
+        notification = groups.get(key) if window and item.target_object_id is not None else None
+        if notification is None:
+            notification = Notification(
+                recipient_id=item.recipient_id,
+                actor_id=item.actor_id,
+                verb=item.verb,
+                target_content_type_id=item.target_content_type_id,
+                target_object_id=item.target_object_id,
+                sample_actors=[usernames.get(item.actor_id)],
+            )
+            created.append(notification)
+            groups[key] = notification
+            unread[item.recipient_id] += 1
+            continue
+
+        username = usernames.get(item.actor_id)
+        if username not in notification.sample_actors:
+            notification.actor_count += 1
+            notification.sample_actors = [username] + notification.sample_actors[:SAMPLE_ACTORS - 1]
+        notification.actor_id = item.actor_id
+        notification.created_at = now
+        if notification.read:
+            notification.read = False
+            unread[item.recipient_id] += 1
+        if notification.pk is not None:
+            updated[notification.pk] = notification
+
+    Notification.objects.bulk_create(created)
+    if updated:
+        Notification.objects.bulk_update(
+            updated.values(), ["actor", "actor_count", "sample_actors", "created_at", "read"]
+        )
+    UnreadCounter.objects.adjust(unread)
+    recipients = {item.recipient_id for item in pending}
+    transaction.on_commit(lambda: broker.publish(recipients))
+
+
+def existing_groups(pending, since):
+    """Latest notification per (recipient, verb, target) started after `since`, locked for update."""
+    candidates = Notification.objects.select_for_update().filter(
+        recipient_id__in={item.recipient_id for item in pending},
+        target_object_id__in={item.target_object_id for item in pending if item.target_object_id is not None},
+        timestamp__gte=since,
+    ).order_by("timestamp", "id")
+    return {
+        (notification.recipient_id, notification.verb, notification.target_content_type_id, notification.target_object_id): notification
+        for notification in candidates
+    }
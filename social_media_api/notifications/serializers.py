@@ -7,4 +7,4 @@ class NotificationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Notification
-        fields = ["id", "actor", "verb", "target", "created_at", "read"]
+        fields = ["id", "actor", "verb", "target", "created_at", "read", "actor_count", "sample_actors"]
@@ -0,0 +1,16 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .models import Notification, UnreadCounter
+
+
+@receiver(pre_delete, sender=get_user_model())
+def release_unread_from_actor(sender, instance, **kwargs):
+    # The actor's notifications cascade away without signals of their own.
+    unread = (
+        Notification.objects.filter(actor=instance, read=False).exclude(recipient=instance)
+        .values("recipient").annotate(total=Count("pk")).values_list("recipient", "total")
+    )
+    UnreadCounter.objects.adjust({recipient_id: -total for recipient_id, total in unread})
@@ -0,0 +1,108 @@
+"""
+Server-Sent Events stream of a user's notifications.
+
+Each open stream subscribes to an in-process broker that the outbox drain
+publishes to after delivering notifications. Drains running in another
+process can't reach the broker, so the stream also re-checks the database
+every NOTIFICATION_STREAM_POLL_INTERVAL seconds; either way a check is one
+indexed range read of the (recipient, created_at) index.
+
+Event ids are "<created_at>_<id>" of the last notification sent, so a
+reconnecting EventSource resumes through the Last-Event-ID header. Coalesced
+notifications move forward in created_at when updated and are sent again.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .serializers import NotificationSerializer
+
+BATCH_SIZE = 50
+
+
+class Broker:
+    """Wakes the streams of users who just received notifications."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)  # user id -> {(loop, event)}
+
+    def subscribe(self, user_id):
+        event = asyncio.Event()
+        with self._lock:
+            self._subscribers[user_id].add((asyncio.get_running_loop(), event))
+        return event
+
+    def unsubscribe(self, user_id, event):
+        with self._lock:
+            self._subscribers[user_id] = {item for item in self._subscribers[user_id] if item[1] is not event}
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+
+    def publish(self, user_ids):
+        """Safe to call from any thread."""
+        with self._lock:
+            subscribers = [item for user_id in user_ids for item in self._subscribers.get(user_id, ())]
+        for loop, event in subscribers:
+            loop.call_soon_threadsafe(event.set)
+
+
+broker = Broker()
+
+
+def poll_interval():
+    return getattr(settings, "NOTIFICATION_STREAM_POLL_INTERVAL", 15)
+
+
+def parse_event_id(value):
+    """Return the (created_at, id) position encoded in an event id, or None."""
+    created_at, _, pk = (value or "").rpartition("_")
+    created_at = parse_datetime(created_at) if created_at else None
+    if created_at is None or not pk.isdigit():
+        return None
+    return created_at, int(pk)
+
+
+def fetch_events(queryset, position):
+    """Serialize the next notifications after `position`, oldest first."""
+    if position is not None:
+        created_at, pk = position
+        queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+    notifications = list(queryset.order_by("created_at", "id")[:BATCH_SIZE])
+    return [
+        (f"{notification.created_at.isoformat()}_{notification.pk}", data)
+        for notification, data in zip(notifications, NotificationSerializer(notifications, many=True).data)
+    ]
+
+
+def current_position(queryset):
+    latest = queryset.order_by("-created_at", "-id").values_list("created_at", "id").first()
+    return tuple(latest) if latest else None
+
+
+async def event_stream(user_id, queryset, position):
+    event = broker.subscribe(user_id)
+    try:
+        if position is None:
+            position = await sync_to_async(current_position)(queryset)
+        yield f"retry: {poll_interval() * 1000}\n\n"
+        while True:
+            event.clear()
+            events = await sync_to_async(fetch_events)(queryset, position)
+            for event_id, data in events:
+                position = parse_event_id(event_id)
+                yield f"id: {event_id}\nevent: notification\ndata: {json.dumps(data)}\n\n"
+            if len(events) == BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(event.wait(), timeout=poll_interval())
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+    finally:
+        broker.unsubscribe(user_id, event)
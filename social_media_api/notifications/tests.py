@@ -1,3 +1,299 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from accounts.models import CustomUser
+from posts.models import Comment, Post
+from .models import Notification, NotificationOutbox, UnreadCounter
+from .outbox import drain
+from .utils import notify
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class OutboxTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user("author", password="pass1234")
+        self.bob = CustomUser.objects.create_user("bob", password="pass1234")
+        self.post = Post.objects.create(author=self.author, title="Post", content="c")
+
+    def test_notify_queues_until_drained(self):
+        queued = notify(self.bob, "liked your post", Post, [(self.author.pk, self.post.pk), (self.bob.pk, self.post.pk)])
+        self.assertEqual(len(queued), 1)  # not to the actor
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+        self.assertFalse(Notification.objects.exists())
+
+        self.assertEqual(drain(), 1)
+        self.assertFalse(NotificationOutbox.objects.exists())
+        notification = Notification.objects.get()
+        self.assertEqual((notification.recipient, notification.actor, notification.target), (self.author, self.bob, self.post))
+        self.assertEqual(drain(), 0)
+
+
+class DrainCommandTests(TransactionTestCase):
+    def test_drains_the_outbox(self):
+        # Committed rows: the command drains on a worker thread with its own connection.
+        author = CustomUser.objects.create_user("author", password="pass1234")
+        bob = CustomUser.objects.create_user("bob", password="pass1234")
+        post = Post.objects.create(author=author, title="Post", content="c")
+        notify(bob, "liked your post", Post, [(author.pk, post.pk)])
+        stdout = StringIO()
+        call_command("drain_notification_outbox", "--workers=1", stdout=stdout)
+        self.assertIn("Delivered 1 notifications.", stdout.getvalue())
+        self.assertEqual(Notification.objects.count(), 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, NOTIFICATION_COALESCE_WINDOW=3600)
+class CoalescingTests(APITestCase):
+    def setUp(self):
+        self.author, self.bob, self.carol = (
+            CustomUser.objects.create_user(name, password="pass1234") for name in ["author", "bob", "carol"]
+        )
+        self.posts = [Post.objects.create(author=self.author, title=f"Post {i}", content="c") for i in range(2)]
+
+    def like(self, actor, post):
+        notify(actor, "liked your post", Post, [(self.author.pk, post.pk)])
+
+    def test_folds_actors_on_the_same_target(self):
+        self.like(self.bob, self.posts[0])
+        drain()
+        self.like(self.carol, self.posts[0])
+        self.like(self.bob, self.posts[0])  # already sampled: not counted again
+        self.like(self.carol, self.posts[1])
+        drain()
+        first, second = Notification.objects.order_by("target_object_id")
+        self.assertEqual((first.actor, first.actor_count, first.sample_actors), (self.bob, 2, ["carol", "bob"]))
+        self.assertEqual((second.actor_count, second.sample_actors), (1, ["carol"]))
+
+    @override_settings(NOTIFICATION_COALESCE_WINDOW=0)
+    def test_disabled_without_a_window(self):
+        self.like(self.bob, self.posts[0])
+        self.like(self.carol, self.posts[0])
+        drain()
+        self.assertEqual(Notification.objects.count(), 2)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class NotificationListTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user("author", password="pass1234")
+        self.client.force_authenticate(self.author)
+
+    def add_notifications(self, count):
+        for i in range(count):
+            actor = CustomUser.objects.create_user(f"actor{CustomUser.objects.count()}", password="pass1234")
+            post = Post.objects.create(author=self.author, title=f"Post {i}", content="c")
+            comment = Comment.objects.create(post=post, author=actor, content=f"Comment {i}")
+            notify(actor, "liked your post", Post, [(self.author.pk, post.pk)])
+            notify(actor, "liked your comment", Comment, [(self.author.pk, comment.pk)])
+        drain()
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/api/notifications/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(row["target"] for row in response.data["results"]))
+        return len(context.captured_queries)
+
+    def test_query_count_is_independent_of_page_contents(self):
+        self.add_notifications(1)
+        baseline = self.list_queries()
+        self.add_notifications(4)
+        self.assertEqual(self.list_queries(), baseline)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, NOTIFICATION_COALESCE_WINDOW=3600)
+class UnreadCounterTests(APITestCase):
+    def setUp(self):
+        self.author, self.bob, self.carol = (
+            CustomUser.objects.create_user(name, password="pass1234") for name in ["author", "bob", "carol"]
+        )
+        self.posts = [Post.objects.create(author=self.author, title=f"Post {i}", content="c") for i in range(2)]
+        self.client.force_authenticate(self.author)
+
+    def like(self, actor, post):
+        notify(actor, "liked your post", Post, [(self.author.pk, post.pk)])
+        drain()
+
+    def assertUnread(self, expected):
+        self.assertEqual(Notification.objects.filter(recipient=self.author, read=False).count(), expected)
+        self.assertEqual(UnreadCounter.objects.get_count(self.author.pk), expected)
+        response = self.client.get("/api/notifications/unread-count/")
+        self.assertEqual(response.data["unread_count"], expected)
+
+    def test_deliver_counts_new_rows_once(self):
+        self.like(self.bob, self.posts[0])
+        self.like(self.carol, self.posts[0])  # coalesced into the unread row
+        self.like(self.bob, self.posts[1])
+        self.assertUnread(2)
+
+    def test_coalescing_into_a_read_row_reopens_it(self):
+        self.like(self.bob, self.posts[0])
+        self.client.post("/api/notifications/mark-all-read/")
+        self.assertUnread(0)
+        self.like(self.carol, self.posts[0])
+        self.assertUnread(1)
+
+    def test_mark_read(self):
+        self.like(self.bob, self.posts[0])
+        self.like(self.bob, self.posts[1])
+        notification = Notification.objects.filter(recipient=self.author).first()
+        url = f"/api/notifications/{notification.pk}/mark-read/"
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertUnread(1)
+
+    def test_mark_read_unknown_or_foreign(self):
+        notify(self.carol, "liked your post", Post, [(self.bob.pk, self.posts[0].pk)])
+        drain()
+        foreign = Notification.objects.get(recipient=self.bob)
+        for pk in ["abc", "99999", str(foreign.pk)]:
+            self.assertEqual(self.client.post(f"/api/notifications/{pk}/mark-read/").status_code, 404)
+        self.assertEqual(UnreadCounter.objects.get_count(self.bob.pk), 1)
+
+    def test_deleting_an_actor_releases_their_unread_rows(self):
+        self.like(self.bob, self.posts[0])
+        self.like(self.carol, self.posts[1])
+        self.bob.delete()
+        self.assertUnread(1)
+
+    def test_reconcile_repairs_drift(self):
+        self.like(self.bob, self.posts[0])
+        self.like(self.bob, self.posts[1])
+        Notification.objects.filter(recipient=self.author, target_object_id=self.posts[0].pk).update(read=True)
+        UnreadCounter.objects.adjust({self.bob.pk: 4})
+        stdout = StringIO()
+        call_command("reconcile_unread_counters", "--chunk-size=1", stdout=stdout)
+        self.assertIn("Reconciled 2 unread counters.", stdout.getvalue())
+        self.assertUnread(1)
+        self.assertEqual(UnreadCounter.objects.get_count(self.bob.pk), 0)
+
+        UnreadCounter.objects.all().delete()
+        call_command("reconcile_unread_counters", stdout=StringIO())
+        self.assertUnread(1)
+
+    def test_mark_all_read(self):
+        self.like(self.bob, self.posts[0])
+        self.like(self.bob, self.posts[1])
+        response = self.client.post("/api/notifications/mark-all-read/")
+        self.assertEqual(response.status_code, 200)
+        self.assertUnread(0)
+
+
+class PruneNotificationsTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob, self.actor = (
+            CustomUser.objects.create_user(name, password="pass1234") for name in ["alice", "bob", "actor"]
+        )
+        now = timezone.now()
+        january, february = (datetime(2020, month, 10, tzinfo=dt_timezone.utc) for month in (1, 2))
+        # alice: three expired rows (one read) and four recent unread ones.
+        self.expired = [
+            self.add(self.alice, january, read=False),
+            self.add(self.alice, january + timedelta(days=1), read=True),
+            self.add(self.alice, february, read=False),
+        ]
+        alice_recent = [self.add(self.alice, now - timedelta(minutes=10 - i), read=False) for i in range(4)]
+        # bob: five recent rows, oldest first; the two oldest overflow a limit of 3.
+        bob_recent = [
+            self.add(self.bob, now - timedelta(minutes=10 - i), read=read)
+            for i, read in enumerate([True, False, False, False, True])
+        ]
+        self.overflow = alice_recent[:1] + bob_recent[:2]
+        UnreadCounter.objects.adjust({self.alice.pk: 6, self.bob.pk: 3})
+
+    def add(self, recipient, created_at, read):
+        notification = Notification.objects.create(recipient=recipient, actor=self.actor, verb="liked your post", read=read)
+        # created_at is auto_now_add; backdate it with an UPDATE.
+        Notification.objects.filter(pk=notification.pk).update(created_at=created_at)
+        return notification.pk
+
+    def prune(self, *args):
+        stdout = StringIO()
+        call_command("prune_notifications", "--days=90", "--max-per-recipient=3", "--chunk-size=2", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def assertPruned(self, output):
+        self.assertIn("Deleted 3 expired and 3 overflow notifications.", output)
+        self.assertFalse(Notification.objects.filter(pk__in=self.expired + self.overflow).exists())
+        self.assertEqual(Notification.objects.filter(recipient=self.alice).count(), 3)
+        self.assertEqual(Notification.objects.filter(recipient=self.bob).count(), 3)
+        for user, unread in [(self.alice, 3), (self.bob, 2)]:
+            self.assertEqual(Notification.objects.filter(recipient=user, read=False).count(), unread)
+            self.assertEqual(UnreadCounter.objects.get_count(user.pk), unread)
+
+    def test_prunes_expired_and_overflow_rows(self):
+        self.assertPruned(self.prune())
+
+    def test_archives_deleted_rows_by_month(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertPruned(self.prune(f"--archive-dir={directory}"))
+            archived = {}
+            for path in Path(directory).glob("notifications-*.jsonl.gz"):
+                with gzip.open(path, "rt", encoding="utf-8") as file:
+                    archived[path.name] = [json.loads(line) for line in file]
+
+        self.assertEqual([row["id"] for row in archived.pop("notifications-2020-01.jsonl.gz")], self.expired[:2])
+        self.assertEqual([row["id"] for row in archived.pop("notifications-2020-02.jsonl.gz")], self.expired[2:])
+        recent = [row for rows in archived.values() for row in rows]
+        self.assertEqual(sorted(row["id"] for row in recent), sorted(self.overflow))
+        self.assertEqual(set(recent[0]), {
+            "id", "recipient_id", "actor_id", "verb", "target_content_type_id", "target_object_id",
+            "created_at", "timestamp", "read", "actor_count", "sample_actors",
+        })
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, NOTIFICATION_STREAM_POLL_INTERVAL=1)
+class NotificationStreamTests(TestCase):
+    url = "/api/notifications/stream/"
+
+    def setUp(self):
+        self.author = CustomUser.objects.create_user("author", password="pass1234")
+        self.bob = CustomUser.objects.create_user("bob", password="pass1234")
+        self.post = Post.objects.create(author=self.author, title="Post", content="c")
+        self.headers = {"Authorization": f"Token {Token.objects.create(user=self.author).key}"}
+
+    def test_refuses_wsgi(self):
+        response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, 501)
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_streams_new_notifications(self):
+        response = await self.async_client.get(self.url, headers=self.headers)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = response.streaming_content.__aiter__()
+        self.assertTrue((await events.__anext__()).startswith(b"retry:"))
+
+        await sync_to_async(notify)(self.bob, "liked your post", Post, [(self.author.pk, self.post.pk)])
+        await sync_to_async(drain)()
+        event = (await events.__anext__()).decode()
+        while event.startswith(":"):  # keep-alive
+            event = (await events.__anext__()).decode()
+        await events.aclose()
+        fields = dict(line.split(": ", 1) for line in event.strip().splitlines())
+        self.assertEqual(fields["event"], "notification")
+        self.assertEqual(json.loads(fields["data"])["verb"], "liked your post")
+
+    async def test_resumes_from_last_event_id(self):
+        await sync_to_async(notify)(self.bob, "liked your post", Post, [(self.author.pk, self.post.pk)])
+        await sync_to_async(drain)()
+        headers = {**self.headers, "Last-Event-ID": "2000-01-01T00:00:00+00:00_0"}
+        response = await self.async_client.get(self.url, headers=headers)
+        events = response.streaming_content.__aiter__()
+        await events.__anext__()
+        self.assertIn(b"liked your post", await events.__anext__())
+        await events.aclose()
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import NotificationViewSet
+from .views import NotificationViewSet, notification_stream
 
 router = DefaultRouter()
 router.register(r"notifications", NotificationViewSet, basename="notifications")
 
 urlpatterns = [
+    path("notifications/stream/", notification_stream, name="notification-stream"),
     path("", include(router.urls)),
 ]
@@ -0,0 +1,34 @@
+from django.contrib.contenttypes.models import ContentType
+
+from accounts.exclusions import silenced_by_ids
+from .models import NotificationOutbox
+
+
+def notify(actor, verb, target_model, targets):
+    """
+    Queue notifications from `actor` with a single insert into the outbox;
+    notifications.outbox.drain() turns them into Notification rows later.
+
+    `targets` is an iterable of (recipient_id, target_object_id) pairs, all
+    pointing at instances of `target_model`. Pairs addressed to the actor
+    or to users blocking or muting them are skipped.
+    """
+    targets = [(recipient_id, target_id) for recipient_id, target_id in targets if recipient_id != actor.pk]
+    if not targets:
+        return []
+    silenced_by = silenced_by_ids(actor.pk)
+    content_type = ContentType.objects.get_for_model(target_model)
+    notifications = [
+        NotificationOutbox(
+            recipient_id=recipient_id,
+            actor=actor,
+            verb=verb,
+            target_content_type=content_type,
+            target_object_id=target_id,
+        )
+        for recipient_id, target_id in targets
+        if recipient_id not in silenced_by
+    ]
+    if notifications:
+        NotificationOutbox.objects.bulk_create(notifications)
+    return notifications
@@ -1,11 +1,81 @@
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets, permissions
-from .models import Notification
+from rest_framework.authtoken.models import Token
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .models import Notification, UnreadCounter
 from .serializers import NotificationSerializer
+from .stream import event_stream, parse_event_id
+from posts.models import Comment, Post
+
+
+def notifications_for(user):
+    # One query per target type, with what each type's __str__ reads
+    # joined in, so a page costs a constant number of queries.
+    targets = GenericPrefetch("target", [
+        Post.objects.select_related("author"),
+        Comment.objects.select_related("author", "post"),
+    ])
+    return Notification.objects.filter(recipient=user).select_related("actor").prefetch_related(targets)
+
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Notification.objects.all().order_by("-created_at")
+    queryset = Notification.objects.all().order_by("-created_at", "-id")
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return self.queryset.filter(recipient=self.request.user)
+        return notifications_for(self.request.user).order_by("-created_at", "-id")
+
+    @action(detail=False, methods=["get"], url_path="unread-count")
+    def unread_count(self, request):
+        return Response({"unread_count": UnreadCounter.objects.get_count(request.user.pk)})
+
+    @action(detail=True, methods=["post"], url_path="mark-read")
+    def mark_read(self, request, pk=None):
+        if not str(pk).isdigit():
+            raise Http404
+        with transaction.atomic():
+            marked = Notification.objects.filter(pk=pk, recipient=request.user, read=False).update(read=True)
+            UnreadCounter.objects.adjust({request.user.pk: -marked})
+        if not marked and not Notification.objects.filter(pk=pk, recipient=request.user).exists():
+            raise Http404
+        return Response({"detail": "Notification marked as read."})
+
+    @action(detail=False, methods=["post"], url_path="mark-all-read")
+    def mark_all_read(self, request):
+        with transaction.atomic():
+            marked = Notification.objects.filter(recipient=request.user, read=False).update(read=True)
+            UnreadCounter.objects.reset(request.user.pk)
+        return Response({"detail": f"{marked} notifications marked as read."})
+
+
+async def notification_stream(request):
+    """
+    GET notifications/stream/: Server-Sent Events feed of new notifications.
+    Authenticates with "Authorization: Token <key>" or the session.
+    """
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the response would be buffered in full, and it never ends.
+        return JsonResponse({"detail": "The notification stream requires an ASGI server."}, status=501)
+    user = None
+    keyword, _, key = request.headers.get("Authorization", "").partition(" ")
+    if keyword == "Token" and key:
+        token = await Token.objects.select_related("user").filter(key=key.strip()).afirst()
+        user = token.user if token else None
+    else:
+        user = await request.auser()
+    if user is None or not user.is_authenticated or not user.is_active:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    position = parse_event_id(request.headers.get("Last-Event-ID") or request.GET.get("last_event_id"))
+    response = StreamingHttpResponse(
+        event_stream(user.pk, notifications_for(user), position),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
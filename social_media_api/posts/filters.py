@@ -0,0 +1,13 @@
+from rest_framework import filters
+
+from .search import get_search_backend
+
+
+class PostSearchFilter(filters.SearchFilter):
+    """?search= backed by the full-text index from posts.search, ranked by relevance."""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "").replace("\x00", "").strip()
+        if not query:
+            return queryset
+        return get_search_backend().search(queryset, query)
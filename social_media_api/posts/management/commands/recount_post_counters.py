@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Like, Post
+
+
+def count_of(model):
+    counts = model.objects.filter(post=OuterRef("pk")).values("post").annotate(total=Count("*")).values("total")
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = "Recompute Post.like_count and Post.comment_count from the Like and Comment tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Posts updated per statement.")
+
+    def handle(self, *args, chunk_size, **options):
+        last_id, updated = 0, 0
+        while True:
+            ids = list(
+                Post.objects.filter(pk__gt=last_id).order_by("pk").values_list("pk", flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                Post.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]).update(
+                    like_count=count_of(Like),
+                    comment_count=count_of(Comment),
+                )
+            last_id = ids[-1]
+            updated += len(ids)
+        self.stdout.write(self.style.SUCCESS(f"Recounted {updated} posts."))
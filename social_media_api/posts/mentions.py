@@ -0,0 +1,33 @@
+import re
+
+from django.contrib.auth import get_user_model
+
+from notifications.utils import notify
+
+# "@handle" not preceded by a word character, so e-mail addresses don't count.
+MENTION = re.compile(r"(?<![\w@])@(\w[\w.@+-]*)")
+MAX_MENTIONS = 20
+
+
+def extract_mentions(*texts):
+    """Case-folded handles mentioned in `texts`, first occurrence first, at most MAX_MENTIONS."""
+    handles = {}
+    for text in texts:
+        for match in MENTION.finditer(text or ""):
+            # A trailing dot ends the sentence rather than the username.
+            handle = match.group(1).rstrip(".").casefold()
+            if handle:
+                handles.setdefault(handle, None)
+    return list(handles)[:MAX_MENTIONS]
+
+
+def notify_mentions(actor, target, *texts):
+    """
+    Notify everyone mentioned in `texts` that `actor` mentioned them in
+    `target`: one query resolving every handle and one outbox insert.
+    """
+    handles = extract_mentions(*texts)
+    if not handles:
+        return []
+    user_ids = get_user_model().objects.filter(username_folded__in=handles).values_list("pk", flat=True)
+    return notify(actor, "mentioned you", type(target), [(user_id, target.pk) for user_id in user_ids])
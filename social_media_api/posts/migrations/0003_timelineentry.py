@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_timelines(apps, schema_editor):
+    CustomUser = apps.get_model("accounts", "CustomUser")
+    Post = apps.get_model("posts", "Post")
+    TimelineEntry = apps.get_model("posts", "TimelineEntry")
+    depth = getattr(settings, "TIMELINE_DEPTH", 500)
+
+    for owner in CustomUser.objects.filter(following__isnull=False).distinct().iterator():
+        posts = (
+            Post.objects.filter(author__in=owner.following.all())
+            .order_by("-created_at", "-id")
+            .values_list("id", "author_id", "created_at")[:depth]
+        )
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(owner_id=owner.id, post_id=post_id, author_id=author_id, created_at=created_at)
+                for post_id, author_id, created_at in posts
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_remove_customuser_followers_customuser_following'),
+        ('posts', '0002_like'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', '-created_at', '-post'], name='timeline_owner_created_idx'), models.Index(fields=['owner', 'author'], name='timeline_owner_author_idx')],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'post'), name='unique_timeline_entry')],
+            },
+        ),
+        migrations.RunPython(populate_timelines, migrations.RunPython.noop),
+    ]
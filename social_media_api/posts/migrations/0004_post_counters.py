@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:15
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Post = apps.get_model("posts", "Post")
+    Like = apps.get_model("posts", "Like")
+    Comment = apps.get_model("posts", "Comment")
+
+    def count_of(model):
+        counts = model.objects.filter(post=OuterRef("pk")).values("post").annotate(total=Count("*")).values("total")
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    Post.objects.update(like_count=count_of(Like), comment_count=count_of(Comment))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
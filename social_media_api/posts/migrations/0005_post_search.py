@@ -0,0 +1,74 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        title, content, content='posts_post', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF title, content ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO posts_post_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS posts_post_fts_update",
+    "DROP TRIGGER IF EXISTS posts_post_fts_delete",
+    "DROP TRIGGER IF EXISTS posts_post_fts_insert",
+    "DROP TABLE IF EXISTS posts_post_fts",
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE posts_post ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX posts_post_search_vector_idx ON posts_post USING GIN (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS posts_post_search_vector_idx",
+    "ALTER TABLE posts_post DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text index for posts.search. It is not declared on the model, so
+    note that on SQLite any later migration that rebuilds posts_post
+    (AlterField and friends) drops the triggers and must recreate them.
+    """
+
+    dependencies = [
+        ('posts', '0004_post_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            run_for_vendor({"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
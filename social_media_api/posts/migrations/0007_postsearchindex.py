@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchIndex',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='posts.post')),
+                ('document', models.TextField(db_column='posts_post_fts')),
+            ],
+            options={
+                'db_table': 'posts_post_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import connections, models
 from django.conf import settings
+from django.utils import timezone
 
 class Post(models.Model):
     author = models.ForeignKey(
@@ -11,11 +12,38 @@ class Post(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)  # set once
     updated_at = models.DateTimeField(auto_now=True)      # update on save
+    # Denormalized counters, updated with F() expressions by the views;
+    # `manage.py recount_post_counters` repairs any drift.
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="post_created_idx"),
+            models.Index(fields=["author", "-created_at", "-id"], name="post_author_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} by {self.author.username}"
 
 
+class PostSearchIndex(models.Model):
+    """
+    The SQLite FTS5 table from migration 0005_post_search, mapped so
+    posts.search can join it (post__search_index) instead of using extra().
+    Not managed by Django and absent on other databases.
+    """
+    post = models.OneToOneField(
+        Post, on_delete=models.DO_NOTHING, primary_key=True, db_column="rowid", related_name="search_index"
+    )
+    # FTS5's hidden column named after the table; the target of MATCH
+    document = models.TextField(db_column="posts_post_fts")
+
+    class Meta:
+        managed = False
+        db_table = "posts_post_fts"
+
+
 class Comment(models.Model):
     post = models.ForeignKey(
         Post, 
@@ -31,17 +59,107 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="comment_created_idx"),
+            models.Index(fields=["post", "-created_at", "-id"], name="comment_post_created_idx"),
+        ]
+
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post.title}"
 
 
+class LikeQuerySet(models.QuerySet):
+    def add(self, user, post_id):
+        """
+        Like a post in one statement. Returns True if a like was inserted,
+        False if it already existed or the post does not exist; never raises
+        on the unique (user, post) conflict.
+
+        Uses INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING, which
+        SQLite (3.35+) and PostgreSQL support.
+        """
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        sql = (
+            f"INSERT INTO {quote(self.model._meta.db_table)} (user_id, post_id, created_at) "
+            f"SELECT %s, id, %s FROM {quote(Post._meta.db_table)} WHERE id = %s "
+            f"ON CONFLICT (user_id, post_id) DO NOTHING RETURNING id"
+        )
+        created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user.pk, created_at, post_id])
+            return cursor.fetchone() is not None
+
+    def remove(self, user, post_id):
+        """Unlike with a single DELETE; returns True if a like was removed."""
+        deleted, _ = self.filter(user=user, post_id=post_id).delete()
+        return deleted > 0
+
+    def add_many(self, user, post_ids):
+        """Batch form of add(): returns the ids of the posts actually liked now."""
+        if not post_ids:
+            return []
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        placeholders = ", ".join(["%s"] * len(post_ids))
+        sql = (
+            f"INSERT INTO {quote(self.model._meta.db_table)} (user_id, post_id, created_at) "
+            f"SELECT %s, id, %s FROM {quote(Post._meta.db_table)} WHERE id IN ({placeholders}) "
+            f"ON CONFLICT (user_id, post_id) DO NOTHING RETURNING post_id"
+        )
+        created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user.pk, created_at, *post_ids])
+            return [row[0] for row in cursor.fetchall()]
+
+    def remove_many(self, user, post_ids):
+        """Batch form of remove(): returns the ids of the posts actually unliked now."""
+        if not post_ids:
+            return []
+        connection = connections[self.db]
+        placeholders = ", ".join(["%s"] * len(post_ids))
+        sql = (
+            f"DELETE FROM {connection.ops.quote_name(self.model._meta.db_table)} "
+            f"WHERE user_id = %s AND post_id IN ({placeholders}) RETURNING post_id"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user.pk, *post_ids])
+            return [row[0] for row in cursor.fetchall()]
+
+
 class Like(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="likes")
     post = models.ForeignKey("posts.Post", on_delete=models.CASCADE, related_name="likes")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = LikeQuerySet.as_manager()
+
     class Meta:
         unique_together = ("user", "post")  # prevents duplicate likes
 
     def __str__(self):
-        return f"{self.user.username} liked {self.post.title}"
\ No newline at end of file
+        return f"{self.user.username} liked {self.post.title}"
+
+
+class TimelineEntry(models.Model):
+    """
+    Materialized feed row: one per (follower, post), written when the post
+    is created so a feed read is a range scan on (owner, created_at).
+    """
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="timeline")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="timeline_entries")
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    created_at = models.DateTimeField()  # copied from post.created_at
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "post"], name="unique_timeline_entry"),
+        ]
+        indexes = [
+            models.Index(fields=["owner", "-created_at", "-post"], name="timeline_owner_created_idx"),
+            models.Index(fields=["owner", "author"], name="timeline_owner_author_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} in timeline of {self.owner_id}"
@@ -0,0 +1,116 @@
+"""
+Full-text search over posts.
+
+The index lives outside the Django model so each database can use its
+native engine (see migration 0005_post_search):
+
+* SQLite: an external-content FTS5 table, posts_post_fts, kept in sync
+  with posts_post by triggers.
+* PostgreSQL: a generated, weighted tsvector column, posts_post.search_vector,
+  with a GIN index.
+
+Backends annotate the queryset with `search_rank` and `search_snippet` and
+order by relevance. Snippets come back as plain text with HIGHLIGHT_START /
+HIGHLIGHT_STOP markers; highlight() escapes them into HTML. Set POSTS_SEARCH_BACKEND to a dotted path to override
+the per-vendor choice.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Lookup, Q, TextField
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+
+from .models import PostSearchIndex
+
+# Private-use characters, so the database never has to emit HTML.
+HIGHLIGHT_START = "\ue000"
+HIGHLIGHT_STOP = "\ue001"
+
+
+def highlight(snippet):
+    """HTML-escape a backend snippet and turn its markers into <mark> tags."""
+    if snippet is None:
+        return None
+    return escape(snippet).replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_STOP, "</mark>")
+
+
+class SearchBackend:
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+
+class ContainsSearchBackend(SearchBackend):
+    """Unindexed icontains scan, for databases without a full-text engine."""
+
+    def search(self, queryset, query):
+        condition = Q()
+        for term in query.split():
+            condition &= Q(title__icontains=term) | Q(content__icontains=term)
+        return queryset.filter(condition)
+
+
+@PostSearchIndex._meta.get_field("document").register_lookup
+class Match(Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+class SQLiteSearchBackend(SearchBackend):
+    # bm25() weights for (title, content); lower scores rank higher
+    weights = (10.0, 1.0)
+
+    def search(self, queryset, query):
+        # Quote every term so user input can't inject FTS5 query syntax.
+        match = " ".join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+        # bm25() and snippet() name the joined FTS table, which keeps its
+        # table name as alias since it is joined once.
+        rank = "bm25(posts_post_fts, {}, {})".format(*self.weights)
+        snippet = "snippet(posts_post_fts, -1, %s, %s, '…', 16)"
+        return (
+            queryset.filter(search_index__document__match=match)
+            .annotate(
+                search_rank=RawSQL(rank, [], output_field=FloatField()),
+                search_snippet=RawSQL(snippet, [HIGHLIGHT_START, HIGHLIGHT_STOP], output_field=TextField()),
+            )
+            .order_by("search_rank", "-created_at")
+        )
+
+
+class PostgresSearchBackend(SearchBackend):
+    config = "english"
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVectorField
+
+        search_query = SearchQuery(query, search_type="websearch", config=self.config)
+        vector = RawSQL('"posts_post"."search_vector"', [], output_field=SearchVectorField())
+        return (
+            queryset.annotate(search_vector=vector)
+            .filter(search_vector=search_query)
+            .annotate(
+                search_rank=SearchRank(vector, search_query),
+                search_snippet=SearchHeadline(
+                    "content", search_query, config=self.config,
+                    start_sel=HIGHLIGHT_START, stop_sel=HIGHLIGHT_STOP,
+                ),
+            )
+            .order_by("-search_rank", "-created_at")
+        )
+
+
+VENDOR_BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    path = getattr(settings, "POSTS_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    return VENDOR_BACKENDS.get(connection.vendor, ContainsSearchBackend)()
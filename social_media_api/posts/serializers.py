@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Post, Comment, Like
+from .search import highlight
 
 class CommentSerializer(serializers.ModelSerializer):
     author_username = serializers.ReadOnlyField(source="author.username")
@@ -10,14 +11,62 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ["author", "created_at", "updated_at"]
 
 
+class PostListSerializer(serializers.ListSerializer):
+    """
+    Looks up which posts of the page the viewer has liked with a single
+    query, so PostSerializer.liked_by_me does not hit the database per post.
+    """
+    def to_representation(self, data):
+        posts = list(data.all() if hasattr(data, "all") else data)
+        request = self.context.get("request")
+        if request is not None and request.user.is_authenticated:
+            self.context["liked_post_ids"] = set(
+                Like.objects.filter(user=request.user, post__in=posts).values_list("post_id", flat=True)
+            )
+        return super().to_representation(posts)
+
+
 class PostSerializer(serializers.ModelSerializer):
     author_username = serializers.ReadOnlyField(source="author.username")
     comments = CommentSerializer(many=True, read_only=True)
+    liked_by_me = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
-        fields = ["id", "author", "author_username", "title", "content", "created_at", "updated_at", "comments"]
-        read_only_fields = ["author", "created_at", "updated_at"]
+        fields = [
+            "id", "author", "author_username", "title", "content", "created_at", "updated_at",
+            "like_count", "comment_count", "liked_by_me", "comments",
+        ]
+        read_only_fields = ["author", "created_at", "updated_at", "like_count", "comment_count"]
+        list_serializer_class = PostListSerializer
+
+    def get_liked_by_me(self, obj):
+        liked_post_ids = self.context.get("liked_post_ids")
+        if liked_post_ids is not None:
+            return obj.pk in liked_post_ids
+        request = self.context.get("request")
+        if request is None or not request.user.is_authenticated:
+            return False
+        return obj.likes.filter(user=request.user).exists()
+
+
+class PostSummarySerializer(PostSerializer):
+    """
+    List representation of a post: instead of every comment it carries the
+    newest few, prefetched for the whole page (see posts.views). The full
+    thread is paged through CommentViewSet with ?post=<id>.
+    """
+    latest_comments = CommentSerializer(many=True, read_only=True)
+    # Matching excerpt as escaped HTML with <mark> highlights; ?search= only
+    search_snippet = serializers.SerializerMethodField()
+
+    class Meta(PostSerializer.Meta):
+        fields = [field for field in PostSerializer.Meta.fields if field != "comments"] + [
+            "latest_comments", "search_snippet",
+        ]
+
+    def get_search_snippet(self, obj):
+        return highlight(getattr(obj, "search_snippet", None))
 
 class LikeSerializer(serializers.ModelSerializer):
     class Meta:
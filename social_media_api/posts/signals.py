@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+
+from . import timeline
+from .models import Post, TimelineEntry
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(m2m_changed, sender=User.following.through)
+def sync_timeline_on_follow(sender, instance, action, reverse, pk_set, **kwargs):
+    # Forward: instance follows pk_set. Reverse: pk_set follow instance.
+    if action == "post_add":
+        if reverse:
+            for owner_id in pk_set:
+                timeline.backfill(owner_id, [instance.pk])
+        else:
+            timeline.backfill(instance.pk, pk_set)
+    elif action == "post_remove":
+        if reverse:
+            for owner_id in pk_set:
+                timeline.prune(owner_id, [instance.pk])
+        else:
+            timeline.prune(instance.pk, pk_set)
+    elif action == "post_clear":
+        if reverse:
+            TimelineEntry.objects.filter(author_id=instance.pk).delete()
+        else:
+            timeline.prune(instance.pk)
@@ -1,3 +1,461 @@
-from django.test import TestCase
+import base64
+import json
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from accounts.models import CustomUser
+from notifications.models import Notification, NotificationOutbox
+from .mentions import MAX_MENTIONS, extract_mentions
+from .models import Post, Comment, Like, TimelineEntry
+
+# Tables whose hot paths must stay on an index.
+HOT_TABLES = ["posts_post", "posts_comment", "posts_timelineentry", "notifications_notification"]
+
+
+@skipUnless(connection.vendor == "sqlite", "reads SQLite's EXPLAIN QUERY PLAN output")
+@override_settings(SECURE_SSL_REDIRECT=False, FEED_FANOUT_THRESHOLD=3)
+class QueryPlanTests(APITestCase):
+    """
+    Runs EXPLAIN QUERY PLAN on every SELECT issued by the list endpoints
+    against a seeded SQLite database, and fails when one of them falls back
+    to scanning a whole hot table or sorting rows in a temporary b-tree.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [CustomUser.objects.create_user(f"user{i}", password="pass1234") for i in range(6)]
+        cls.reader = cls.users[0]
+        # user1 is above the fan-out threshold, so the feed pulls their posts.
+        for follower in cls.users[2:]:
+            follower.following.add(cls.users[1])
+        cls.reader.following.add(*cls.users[1:4])
+
+        posts = []
+        for i in range(60):
+            posts.append(Post.objects.create(author=cls.users[i % 6], title=f"Post {i}", content="Lorem ipsum"))
+        for i in range(120):
+            Comment.objects.create(post=posts[i % 60], author=cls.users[i % 5], content=f"Comment {i}")
+        Notification.objects.bulk_create(
+            Notification(recipient=cls.users[i % 6], actor=cls.users[(i + 1) % 6], verb="liked your post", read=i % 3 == 0)
+            for i in range(120)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        self.client.force_authenticate(self.reader)
+
+    def assertIndexedPlans(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+        selects = [query["sql"] for query in context.captured_queries if query["sql"].startswith("SELECT")]
+        self.assertTrue(selects, url)
+        for sql in selects:
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                plan = [row[-1] for row in cursor.fetchall()]
+            # The sliced comment prefetch re-sorts its window output, which
+            # is bounded by page size x preview size; that sort is fine.
+            bounded = any(step.startswith("SCAN qualify") for step in plan)
+            for step in plan:
+                if "USE TEMP B-TREE FOR ORDER BY" in step and not bounded:
+                    self.fail(f"{url}: sort in\n{sql}\n{plan}")
+                for table in HOT_TABLES:
+                    if step.startswith(f"SCAN {table}") and "INDEX" not in step:
+                        self.fail(f"{url}: full scan of {table} in\n{sql}\n{plan}")
+        return response
+
+    def test_post_list(self):
+        self.assertIndexedPlans("/api/posts/")
+
+    def test_post_list_second_page(self):
+        self.assertIndexedPlans("/api/posts/?page=2")
+
+    def test_post_detail(self):
+        self.assertIndexedPlans(f"/api/posts/{Post.objects.first().pk}/")
+
+    def test_comment_list(self):
+        self.assertIndexedPlans("/api/comments/")
+
+    def test_comments_of_post(self):
+        response = self.assertIndexedPlans(f"/api/comments/?post={Post.objects.first().pk}")
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_comment_list_next_page(self):
+        response = self.client.get("/api/comments/")
+        self.assertIndexedPlans(response.data["next"])
+
+    def test_notification_list(self):
+        self.assertIndexedPlans("/api/notifications/")
+
+    def test_feed(self):
+        response = self.assertIndexedPlans("/api/feed/")
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertTrue(any(post["author"] == self.users[1].pk for post in response.data["results"]))
+
+    def test_feed_next_page(self):
+        response = self.client.get("/api/feed/")
+        self.assertIndexedPlans(response.data["next"])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class LikeBatchTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user("author", password="pass1234")
+        self.user = CustomUser.objects.create_user("reader", password="pass1234")
+        self.posts = [Post.objects.create(author=self.author, title=f"Post {i}", content="c") for i in range(3)]
+        self.client.force_authenticate(self.user)
+
+    def batch(self, name, ids):
+        response = self.client.post(f"/api/posts/{name}/", {"ids": ids}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return [row["result"] for row in response.data["results"]]
+
+    def like_counts(self):
+        return [Post.objects.get(pk=post.pk).like_count for post in self.posts]
+
+    def test_counts_only_inserted_likes(self):
+        Like.objects.add(self.user, self.posts[0].pk)
+        Post.objects.filter(pk=self.posts[0].pk).update(like_count=1)
+        ids = [post.pk for post in self.posts[:2]] + [9999]
+        self.assertEqual(self.batch("like-batch", ids), ["already_liked", "liked", "not_found"])
+        # A retried batch changes nothing.
+        self.assertEqual(self.batch("like-batch", ids), ["already_liked", "already_liked", "not_found"])
+        self.assertEqual(self.like_counts(), [1, 1, 0])
+        self.assertEqual(NotificationOutbox.objects.filter(recipient=self.author).count(), 1)
+
+    def test_counts_only_deleted_likes(self):
+        Like.objects.add(self.user, self.posts[0].pk)
+        Post.objects.filter(pk=self.posts[0].pk).update(like_count=1)
+        ids = [self.posts[0].pk, self.posts[1].pk, 9999]
+        self.assertEqual(self.batch("unlike-batch", ids), ["unliked", "not_liked", "not_found"])
+        self.assertEqual(self.batch("unlike-batch", ids), ["not_liked", "not_liked", "not_found"])
+        self.assertEqual(self.like_counts(), [0, 0, 0])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class LikeTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user("author", password="pass1234")
+        self.user = CustomUser.objects.create_user("reader", password="pass1234")
+        self.post = Post.objects.create(author=self.author, title="Post", content="c")
+        self.url = f"/api/posts/{self.post.pk}/like/"
+        self.client.force_authenticate(self.user)
+
+    def assertLikes(self, count):
+        self.assertEqual(Post.objects.get(pk=self.post.pk).like_count, count)
+        self.assertEqual(Like.objects.filter(post=self.post).count(), count)
+
+    def test_put_and_delete_are_idempotent(self):
+        self.assertEqual(self.client.put(self.url).status_code, 200)
+        self.assertEqual(self.client.put(self.url).status_code, 200)
+        self.assertLikes(1)
+        self.assertEqual(NotificationOutbox.objects.filter(recipient=self.author).count(), 1)
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertLikes(0)
+
+    def test_post_routes_keep_their_400(self):
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+        self.assertEqual(self.client.post(self.url).status_code, 400)
+        self.assertLikes(1)
+        unlike = f"/api/posts/{self.post.pk}/unlike/"
+        self.assertEqual(self.client.post(unlike).status_code, 200)
+        self.assertEqual(self.client.post(unlike).status_code, 400)
+        self.assertLikes(0)
+
+    def test_missing_post(self):
+        for method, path in [("put", "like"), ("delete", "like"), ("post", "like"), ("post", "unlike")]:
+            response = getattr(self.client, method)(f"/api/posts/9999/{path}/")
+            self.assertEqual(response.status_code, 404, (method, path))
+        self.assertFalse(Like.objects.exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PostCounterTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user("author", password="pass1234")
+        self.posts = [Post.objects.create(author=self.user, title=f"Post {i}", content="c") for i in range(3)]
+        self.client.force_authenticate(self.user)
+
+    def counts(self):
+        return list(Post.objects.order_by("pk").values_list("like_count", "comment_count"))
+
+    def test_comment_count_follows_create_and_delete(self):
+        response = self.client.post("/api/comments/", {"post": self.posts[0].pk, "content": "First"})
+        self.assertEqual(response.status_code, 201)
+        self.client.post("/api/comments/", {"post": self.posts[0].pk, "content": "Second"})
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).comment_count, 2)
+        self.assertEqual(self.client.delete(f"/api/comments/{response.data['id']}/").status_code, 204)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).comment_count, 1)
+
+    def test_recount_repairs_drift(self):
+        Comment.objects.create(post=self.posts[0], author=self.user, content="c")
+        Like.objects.add(self.user, self.posts[1].pk)
+        Post.objects.update(like_count=7, comment_count=9)
+        stdout = StringIO()
+        call_command("recount_post_counters", "--chunk-size=2", stdout=stdout)
+        self.assertIn("Recounted 3 posts.", stdout.getvalue())
+        self.assertEqual(self.counts(), [(0, 1), (1, 0), (0, 0)])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class LikedByMeTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user("author", password="pass1234")
+        cls.reader = CustomUser.objects.create_user("reader", password="pass1234")
+        cls.reader.following.add(cls.author)
+        cls.posts = [Post.objects.create(author=cls.author, title=f"Post {i}", content="c") for i in range(5)]
+        for post in cls.posts[::2]:
+            Like.objects.add(cls.reader, post.pk)
+
+    def liked(self, url, like_queries=1):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        queries = [query["sql"] for query in context.captured_queries if 'FROM "posts_like"' in query["sql"]]
+        self.assertEqual(len(queries), like_queries, queries)
+        return {post["id"]: post["liked_by_me"] for post in response.data["results"]}
+
+    def test_list_and_feed(self):
+        self.client.force_authenticate(self.reader)
+        expected = {post.pk: i % 2 == 0 for i, post in enumerate(self.posts)}
+        self.assertEqual(self.liked("/api/posts/"), expected)
+        self.assertEqual(self.liked("/api/feed/"), expected)
+
+    def test_anonymous(self):
+        self.assertEqual(set(self.liked("/api/posts/", like_queries=0).values()), {False})
+
+    def test_detail(self):
+        self.client.force_authenticate(self.reader)
+        self.assertTrue(self.client.get(f"/api/posts/{self.posts[0].pk}/").data["liked_by_me"])
+        self.assertFalse(self.client.get(f"/api/posts/{self.posts[1].pk}/").data["liked_by_me"])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class KeysetPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user("reader", password="pass1234")
+        post = Post.objects.create(author=cls.user, title="Post", content="c")
+        cls.comments = [Comment.objects.create(post=post, author=cls.user, content=f"Comment {i}") for i in range(25)]
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.data["results"]]
+
+    def test_walks_forward_and_back(self):
+        newest_first = [comment.pk for comment in reversed(self.comments)]
+        pages, response = [], self.client.get("/api/comments/")
+        self.assertIsNone(response.data["previous"])
+        while True:
+            pages.append(self.ids(response))
+            if response.data["next"] is None:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(sum(pages, []), newest_first)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+
+        for expected in reversed(pages[:-1]):
+            response = self.client.get(response.data["previous"])
+            self.assertEqual(self.ids(response), expected)
+        self.assertIsNone(response.data["previous"])
+
+    def test_rejects_bad_cursors(self):
+        def encode(data):
+            return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+        cursors = [
+            "not-base64!",
+            encode([1, 2]),
+            encode({"p": [["dt", "2020-01-01T00:00:00+00:00"], "abc"]}),
+            encode({"p": [["dt", "yesterday"], 1]}),
+            encode({"p": [["dt", "2020-01-01T00:00:00+00:00"]]}),
+            encode({"p": [None, 1]}),
+            encode({"p": [[], 1]}),
+        ]
+        for url in ["/api/comments/", "/api/feed/"]:
+            for cursor in cursors:
+                response = self.client.get(url, {"cursor": cursor})
+                self.assertEqual(response.status_code, 404, (url, cursor))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PostSearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user("author", password="pass1234")
+        cls.title_hit = Post.objects.create(author=author, title="Zebra facts", content="Stripes everywhere")
+        cls.content_hit = Post.objects.create(author=author, title="Unsafe", content="<img src=x onerror=alert(1)> zebra")
+        Post.objects.create(author=author, title="Lions", content="Manes")
+
+    def test_ranks_matches(self):
+        response = self.client.get("/api/posts/", {"search": "zebra"})
+        self.assertEqual(
+            [post["id"] for post in response.data["results"]], [self.title_hit.pk, self.content_hit.pk]
+        )
+
+    def test_snippet_is_escaped(self):
+        response = self.client.get("/api/posts/", {"search": "zebra"})
+        snippet = response.data["results"][1]["search_snippet"]
+        self.assertNotIn("<img", snippet)
+        self.assertIn("&lt;img", snippet)
+        self.assertIn("<mark>zebra</mark>", snippet)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, TIMELINE_DEPTH=3, TIMELINE_TRIM_SLACK=2)
+class TimelineTrimTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user("author", password="pass1234")
+        self.reader = CustomUser.objects.create_user("reader", password="pass1234")
+        self.reader.following.add(self.author)
+
+    def entries(self):
+        return list(
+            TimelineEntry.objects.filter(owner=self.reader).order_by("-created_at", "-post_id").values_list("post_id", flat=True)
+        )
+
+    def test_trims_only_past_the_slack(self):
+        posts = [Post.objects.create(author=self.author, title=f"Post {i}", content="c") for i in range(5)]
+        self.assertEqual(len(self.entries()), 5)
+        posts.append(Post.objects.create(author=self.author, title="Post 5", content="c"))
+        self.assertEqual(self.entries(), [post.pk for post in reversed(posts[-3:])])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, FEED_FANOUT_THRESHOLD=2)
+class FeedMergeTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user("author", password="pass1234")
+        self.reader = CustomUser.objects.create_user("reader", password="pass1234")
+        self.other = CustomUser.objects.create_user("other", password="pass1234")
+        self.reader.following.add(self.author, self.other)
+        self.client.force_authenticate(self.reader)
+
+    def feed(self):
+        response = self.client.get("/api/feed/")
+        self.assertEqual(response.status_code, 200)
+        return [post["id"] for post in response.data["results"]]
+
+    def post(self, author, title):
+        return Post.objects.create(author=author, title=title, content="c").pk
+
+    def test_merges_across_the_threshold(self):
+        fan = CustomUser.objects.create_user("fan", password="pass1234")
+        pushed = self.post(self.author, "pushed")
+        interleaved = self.post(self.other, "other")
+        # A second follower puts the author at the threshold: later posts are pulled.
+        fan.following.add(self.author)
+        pulled = self.post(self.author, "pulled")
+        self.assertFalse(TimelineEntry.objects.filter(post_id=pulled).exists())
+        self.assertEqual(self.feed(), [pulled, interleaved, pushed])
+
+        # Back below the threshold, the pulled post must not drop out.
+        fan.following.remove(self.author)
+        newest = self.post(self.author, "pushed again")
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.reader, post_id=newest).exists())
+        self.assertEqual(self.feed(), [newest, pulled, interleaved, pushed])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class MentionTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user("author", password="pass1234")
+        self.bob = CustomUser.objects.create_user("Bob", password="pass1234")
+        self.client.force_authenticate(self.author)
+
+    def test_extract_mentions(self):
+        self.assertEqual(
+            extract_mentions("Hi @Bob, @bob and @carol.", "mail bob@example.com or @dave_1!", None),
+            ["bob", "carol", "dave_1"],
+        )
+        self.assertEqual(extract_mentions("@@bob @ alone"), [])
+        self.assertEqual(len(extract_mentions(" ".join(f"@user{i}" for i in range(30)))), MAX_MENTIONS)
+
+    def mentions(self):
+        return list(NotificationOutbox.objects.filter(verb="mentioned you").values_list("recipient__username", flat=True))
+
+    def test_post_and_comment_mentions_are_queued(self):
+        response = self.client.post("/api/posts/", {"title": "Hi @BOB", "content": "@bob @author @nobody"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.mentions(), ["Bob"])
+        response = self.client.post("/api/comments/", {"post": response.data["id"], "content": "cc @bob"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.mentions(), ["Bob", "Bob"])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, FEED_FANOUT_THRESHOLD=3)
+class BlockMuteTests(APITestCase):
+    def setUp(self):
+        # Block/mute sets are cached per user id, and ids get reused across tests.
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.me, self.blocked, self.muted, self.friend = (
+            CustomUser.objects.create_user(name, password="pass1234") for name in ["me", "blocked", "muted", "friend"]
+        )
+        self.me.following.add(self.blocked, self.muted, self.friend)
+        self.blocked.following.add(self.me)
+        self.posts = {
+            user.username: Post.objects.create(author=user, title=f"By {user.username}", content="c").pk
+            for user in [self.me, self.blocked, self.muted, self.friend]
+        }
+        self.client.force_authenticate(self.me)
+        self.client.post(f"/api/accounts/users/{self.blocked.pk}/block/")
+        self.client.post(f"/api/accounts/users/{self.muted.pk}/mute/")
+
+    def visible(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        by_id = {pk: name for name, pk in self.posts.items()}
+        return sorted(by_id[post["id"]] for post in response.data["results"])
+
+    def test_block_drops_follows_both_ways(self):
+        self.assertFalse(self.me.following.filter(pk=self.blocked.pk).exists())
+        self.assertFalse(self.blocked.following.filter(pk=self.me.pk).exists())
+
+    def test_no_follow_while_blocked(self):
+        for actor, target in [(self.blocked, self.me), (self.me, self.blocked)]:
+            self.client.force_authenticate(actor)
+            self.assertEqual(self.client.post(f"/api/accounts/users/{target.pk}/follow/").status_code, 403)
+            self.assertEqual(self.client.post(f"/api/accounts/follow/{target.pk}/").status_code, 403)
+            response = self.client.post("/api/accounts/users/follow-batch/", {"ids": [target.pk]}, format="json")
+            self.assertEqual(response.data["results"], [{"id": target.pk, "result": "blocked"}])
+        self.assertFalse(self.blocked.following.filter(pk=self.me.pk).exists())
+        self.assertFalse(self.me.following.filter(pk=self.blocked.pk).exists())
+        self.assertEqual(CustomUser.objects.get(pk=self.me.pk).followers_count, 0)
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.blocked, author=self.me).exists())
+
+    def test_hidden_from_listing_and_feed(self):
+        self.assertEqual(self.visible("/api/posts/"), ["friend", "me"])
+        self.assertEqual(self.visible("/api/feed/"), ["friend"])
+
+    def test_blocking_hides_both_ways_and_muting_one_way(self):
+        self.client.force_authenticate(self.blocked)
+        self.assertEqual(self.visible("/api/posts/"), ["blocked", "friend", "muted"])
+        self.client.force_authenticate(self.muted)
+        self.assertEqual(self.visible("/api/posts/"), ["blocked", "friend", "me", "muted"])
+
+    def test_unmute_shows_posts_again(self):
+        self.client.post(f"/api/accounts/users/{self.muted.pk}/unmute/")
+        self.assertEqual(self.visible("/api/posts/"), ["friend", "me", "muted"])
+
+    def test_silenced_users_are_not_notified(self):
+        for actor in [self.blocked, self.muted, self.friend]:
+            self.client.force_authenticate(actor)
+            self.client.put(f"/api/posts/{self.posts['me']}/like/")
+        self.assertEqual(
+            list(NotificationOutbox.objects.filter(recipient=self.me).values_list("actor__username", flat=True)),
+            ["friend"],
+        )
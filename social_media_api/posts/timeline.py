@@ -0,0 +1,156 @@
+import heapq
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import Post, TimelineEntry
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def timeline_depth():
+    return getattr(settings, "TIMELINE_DEPTH", 500)
+
+
+def trim_slack():
+    return getattr(settings, "TIMELINE_TRIM_SLACK", 50)
+
+
+def fanout_threshold():
+    return getattr(settings, "FEED_FANOUT_THRESHOLD", 10000)
+
+
+def fan_out(post):
+    """
+    Push a newly created post into the timeline of every follower. Authors
+    at or above FEED_FANOUT_THRESHOLD followers are skipped and flagged
+    feed_pulled; read_feed pulls their posts at read time instead.
+    """
+    User = get_user_model()
+    # Read the counter fresh: post.author may be a stale in-memory instance.
+    followers_count, feed_pulled = User.objects.values_list("followers_count", "feed_pulled").get(pk=post.author_id)
+    if followers_count >= fanout_threshold():
+        if not feed_pulled:
+            User.objects.filter(pk=post.author_id).update(feed_pulled=True)
+        return
+    follower_ids = list(post.author.followers.values_list("id", flat=True))
+    for start in range(0, len(follower_ids), FANOUT_BATCH_SIZE):
+        owner_ids = follower_ids[start:start + FANOUT_BATCH_SIZE]
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(owner_id=owner_id, post=post, author_id=post.author_id, created_at=post.created_at)
+                for owner_id in owner_ids
+            ],
+            ignore_conflicts=True,
+        )
+        trim(owner_ids)
+
+
+def backfill(owner_id, author_ids):
+    """Copy the most recent posts of newly followed, pushed authors into a timeline."""
+    depth = timeline_depth()
+    author_ids = get_user_model().objects.filter(
+        pk__in=author_ids, followers_count__lt=fanout_threshold(), feed_pulled=False
+    ).values_list("pk", flat=True)
+    entries = []
+    for author_id in author_ids:
+        recent = Post.objects.filter(author_id=author_id).order_by("-created_at", "-id").values_list("id", "created_at")
+        entries.extend(
+            TimelineEntry(owner_id=owner_id, post_id=post_id, author_id=author_id, created_at=created_at)
+            for post_id, created_at in recent[:depth]
+        )
+    TimelineEntry.objects.bulk_create(entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+    trim([owner_id])
+
+
+def prune(owner_id, author_ids=None):
+    """Drop the entries of unfollowed authors (or every entry if author_ids is None)."""
+    entries = TimelineEntry.objects.filter(owner_id=owner_id)
+    if author_ids is not None:
+        entries = entries.filter(author_id__in=author_ids)
+    entries.delete()
+
+
+def trim(owner_ids):
+    """
+    Cut back to the newest TIMELINE_DEPTH entries the timelines of owners
+    that have grown more than TIMELINE_TRIM_SLACK past it.
+
+    The slack means a full timeline is trimmed once every few fan-outs
+    rather than on each one, and the window only runs over those owners.
+    """
+    depth = timeline_depth()
+    overflowing = list(
+        TimelineEntry.objects.filter(owner_id__in=owner_ids)
+        .values("owner_id")
+        .annotate(entries=Count("id"))
+        .filter(entries__gt=depth + trim_slack())
+        .values_list("owner_id", flat=True)
+    )
+    if not overflowing:
+        return
+    overflow = (
+        TimelineEntry.objects.filter(owner_id__in=overflowing)
+        .annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=F("owner_id"),
+                order_by=[F("created_at").desc(), F("post_id").desc()],
+            )
+        )
+        .filter(row_number__gt=depth)
+        .values_list("id", flat=True)
+    )
+    TimelineEntry.objects.filter(id__in=list(overflow)).delete()
+
+
+def read_feed(user, paginator, position=None, reverse=False, limit=None, hidden_author_ids=()):
+    """
+    Return up to `limit` feed posts past `position` in the paginator's
+    (created_at, id) order, leaving out posts by `hidden_author_ids`.
+
+    Pushed TimelineEntry rows and posts pulled at read time from followed
+    authors above the fan-out threshold are read as sorted streams and
+    k-way merged. Authors flagged feed_pulled stay pulled after dropping
+    below the threshold, since their posts from above it were never pushed.
+    """
+    pushed = (
+        TimelineEntry.objects.filter(owner=user)
+        .select_related("post__author")
+        .order_by(*paginator.get_ordering(reverse, fields=["created_at", "post_id"]))
+    )
+    if position is not None:
+        pushed = pushed.filter(paginator.after(position, reverse, fields=["created_at", "post_id"]))
+    if hidden_author_ids:
+        pushed = pushed.exclude(author_id__in=hidden_author_ids)
+    streams = [[entry.post for entry in pushed[:limit]]]
+
+    pulled_author_ids = [
+        pk for pk in user.following.filter(
+            Q(followers_count__gte=fanout_threshold()) | Q(feed_pulled=True)
+        ).values_list("pk", flat=True)
+        if pk not in hidden_author_ids
+    ]
+    if pulled_author_ids:
+        pulled = (
+            Post.objects.filter(author_id__in=pulled_author_ids)
+            .select_related("author")
+            .order_by(*paginator.get_ordering(reverse, fields=["created_at", "id"]))
+        )
+        if position is not None:
+            pulled = pulled.filter(paginator.after(position, reverse, fields=["created_at", "id"]))
+        streams.append(list(pulled[:limit]))
+
+    posts, seen = [], set()
+    merged = heapq.merge(*streams, key=lambda post: (post.created_at, post.id), reverse=not reverse)
+    for post in merged:
+        # A feed_pulled author's older, pushed posts show up in both streams.
+        if post.id in seen:
+            continue
+        seen.add(post.id)
+        posts.append(post)
+        if len(posts) == limit:
+            break
+    return posts
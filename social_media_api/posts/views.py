@@ -1,9 +1,21 @@
-from rest_framework import viewsets, permissions, filters, generics
-from rest_framework.decorators import api_view, permission_classes, action
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Prefetch, prefetch_related_objects
+from django.http import Http404
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import api_view, permission_classes, action, throttle_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from .filters import PostSearchFilter
+from .mentions import notify_mentions
 from .models import Post, Comment, Like
-from .serializers import PostSerializer, CommentSerializer, LikeSerializer
-from notifications.models import Notification
+from .serializers import PostSerializer, PostSummarySerializer, CommentSerializer, LikeSerializer
+from .timeline import read_feed
+from accounts.exclusions import hidden_author_ids
+from accounts.throttling import TokenBucketThrottle
+from notifications.utils import notify
+from social_media_api.pagination import KeysetPagination
+from social_media_api.serializers import IdListSerializer
 
 
 class IsAuthorOrReadOnly(permissions.BasePermission):
@@ -16,65 +28,210 @@ class IsAuthorOrReadOnly(permissions.BasePermission):
         return obj.author == request.user
 
 
+def latest_comments_prefetch(hidden=()):
+    """
+    Prefetch the newest COMMENT_PREVIEW_SIZE comments of each post into
+    `latest_comments`. Django turns the sliced queryset into a single
+    ROW_NUMBER() OVER (PARTITION BY post_id ...) query for the whole page.
+    """
+    size = getattr(settings, "COMMENT_PREVIEW_SIZE", 3)
+    comments = Comment.objects.select_related("author").order_by("-created_at", "-id")
+    if hidden:
+        comments = comments.exclude(author_id__in=hidden)
+    comments = comments[:size]
+    return Prefetch("comments", queryset=comments, to_attr="latest_comments")
+
+
 class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.all().order_by("-created_at")
+    queryset = Post.objects.all().order_by("-created_at", "-id")
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ["title", "content"]
+    filter_backends = [PostSearchFilter]
+    throttle_scope = None  # set per action, e.g. "likes"
+
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related("author")
+        if self.action == "list":
+            hidden = hidden_author_ids(self.request)
+            if hidden:
+                queryset = queryset.exclude(author_id__in=hidden)
+            queryset = queryset.prefetch_related(latest_comments_prefetch(hidden))
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return PostSummarySerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        notify_mentions(self.request.user, post, post.title, post.content)
 
-    @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
-    def like(self, request, pk=None):
-        post = generics.get_object_or_404(Post, pk=pk)
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
+    # Like/unlike are a single conflict-free write each. PUT and DELETE on
+    # like/ are idempotent; POST like/ and POST unlike/ keep answering 400
+    # when there is nothing to do.
 
+    @action(
+        detail=True,
+        methods=["post", "put"],
+        permission_classes=[permissions.IsAuthenticated],
+        throttle_scope="likes",
+    )
+    def like(self, request, pk=None):
+        post_id = self._post_id(pk)
+        with transaction.atomic():
+            created = Like.objects.add(request.user, post_id)
+            if created:
+                Post.objects.filter(pk=post_id).update(like_count=F("like_count") + 1)
         if created:
-            if post.author != request.user:
-                Notification.objects.create(
-                    recipient=post.author,
-                    actor=request.user,
-                    verb="liked your post",
-                    target=post,
-                )
-            return Response({"detail": "Post liked."})
-        return Response({"detail": "You already liked this post."}, status=400)
-
-    @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+            self._notify_liked(request.user, post_id)
+        elif not Post.objects.filter(pk=pk).exists():
+            raise Http404
+        elif request.method == "POST":
+            return Response({"detail": "You already liked this post."}, status=400)
+        return Response({"detail": "Post liked."})
+
+    @like.mapping.delete
+    def remove_like(self, request, pk=None):
+        if not self._remove_like(request.user, self._post_id(pk)) and not Post.objects.filter(pk=pk).exists():
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        detail=True,
+        methods=["post"],
+        permission_classes=[permissions.IsAuthenticated],
+        throttle_scope="likes",
+    )
     def unlike(self, request, pk=None):
-        post = generics.get_object_or_404(Post, pk=pk)
-        try:
-            like = Like.objects.get(user=request.user, post=post)
-            like.delete()
+        if self._remove_like(request.user, self._post_id(pk)):
             return Response({"detail": "Post unliked."})
-        except Like.DoesNotExist:
-            return Response({"detail": "You have not liked this post."}, status=400)
+        if not Post.objects.filter(pk=pk).exists():
+            raise Http404
+        return Response({"detail": "You have not liked this post."}, status=400)
+
+    def _post_id(self, pk):
+        if not str(pk).isdigit():
+            raise Http404
+        return int(pk)
+
+    def _remove_like(self, user, post_id):
+        with transaction.atomic():
+            removed = Like.objects.remove(user, post_id)
+            if removed:
+                Post.objects.filter(pk=post_id).update(like_count=F("like_count") - 1)
+        return removed
+
+    def _notify_liked(self, user, post_id):
+        author_id = Post.objects.values_list("author_id", flat=True).get(pk=post_id)
+        notify(user, "liked your post", Post, [(author_id, post_id)])
+
+    # Batch variants for clients replaying offline actions: set-based
+    # writes and one bulk notification insert, with a result per id.
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="like-batch",
+        permission_classes=[permissions.IsAuthenticated],
+        throttle_scope="likes",
+    )
+    def like_batch(self, request):
+        ids = self._batch_ids(request)
+        # Counters and notifications follow the rows the INSERT reports, so
+        # concurrent or retried batches can't count a like twice.
+        with transaction.atomic():
+            new_ids = set(Like.objects.add_many(request.user, ids))
+            Post.objects.filter(pk__in=new_ids).update(like_count=F("like_count") + 1)
+        authors = dict(Post.objects.filter(pk__in=ids).values_list("pk", "author_id"))
+        notify(request.user, "liked your post", Post, [
+            (authors[post_id], post_id) for post_id in new_ids if post_id in authors
+        ])
+
+        def result(post_id):
+            if post_id in new_ids:
+                return "liked"
+            return "already_liked" if post_id in authors else "not_found"
+        return Response({"results": [{"id": post_id, "result": result(post_id)} for post_id in ids]})
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="unlike-batch",
+        permission_classes=[permissions.IsAuthenticated],
+        throttle_scope="likes",
+    )
+    def unlike_batch(self, request):
+        ids = self._batch_ids(request)
+        with transaction.atomic():
+            removed = set(Like.objects.remove_many(request.user, ids))
+            Post.objects.filter(pk__in=removed).update(like_count=F("like_count") - 1)
+        existing = removed | set(Post.objects.filter(pk__in=set(ids) - removed).values_list("pk", flat=True))
+
+        def result(post_id):
+            if post_id not in existing:
+                return "not_found"
+            return "unliked" if post_id in removed else "not_liked"
+        return Response({"results": [{"id": post_id, "result": result(post_id)} for post_id in ids]})
+
+    def _batch_ids(self, request):
+        serializer = IdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data["ids"]
 
 
 class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Comment.objects.all().order_by("-created_at")
+    queryset = Comment.objects.all().order_by("-created_at", "-id")
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related("author")
+        post_id = self.request.query_params.get("post")
+        if post_id is not None:
+            if not post_id.isdigit():
+                raise ValidationError({"post": "Must be a post id."})
+            queryset = queryset.filter(post_id=post_id)
+        if self.action == "list":
+            hidden = hidden_author_ids(self.request)
+            if hidden:
+                queryset = queryset.exclude(author_id__in=hidden)
+        return queryset
 
     def perform_create(self, serializer):
-        comment = serializer.save(author=self.request.user)
-        if comment.post.author != self.request.user:
-            Notification.objects.create(
-                recipient=comment.post.author,
-                actor=self.request.user,
-                verb="commented on your post",
-                target=comment.post,
-            )
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user)
+            Post.objects.filter(pk=comment.post_id).update(comment_count=F("comment_count") + 1)
+        notify(self.request.user, "commented on your post", Post, [(comment.post.author_id, comment.post_id)])
+        notify_mentions(self.request.user, comment, comment.content)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            Post.objects.filter(pk=instance.post_id).update(comment_count=F("comment_count") - 1)
 
 
 # ✅ Add the feed endpoint back
+class FeedThrottle(TokenBucketThrottle):
+    scope = "feed"
+
+
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated])
+@throttle_classes([FeedThrottle])
 def feed(request):
-    user = request.user
-    following_users = user.following.all()  # checker wants this
-    posts = Post.objects.filter(author__in=following_users).order_by("-created_at")  # checker wants this
-    serializer = PostSerializer(posts, many=True)
-    return Response(serializer.data)
+    # Posts are pushed into TimelineEntry on creation (see posts.timeline),
+    # so each page is a range scan on (owner, created_at) merged with the
+    # posts of followed high-follower accounts, instead of a join over
+    # user.following.all().
+    paginator = KeysetPagination()
+    hidden = hidden_author_ids(request)
+    posts = paginator.paginate(
+        lambda position, reverse, limit: read_feed(request.user, paginator, position, reverse, limit, hidden),
+        request,
+        Post,
+    )
+    prefetch_related_objects(posts, latest_comments_prefetch(hidden))
+    serializer = PostSummarySerializer(posts, many=True, context={"request": request})
+    return paginator.get_paginated_response(serializer.data)
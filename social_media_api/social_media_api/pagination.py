@@ -0,0 +1,164 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on a compound, unique ordering such as
+    (created_at, id). Each page is a single range query no matter how deep
+    the client scrolls, unlike OFFSET-based page numbers.
+
+    Cursors are opaque base64 blobs holding the key of the boundary row and
+    the direction to read in.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    # Every field but the last may repeat; the last must be unique.
+    ordering = ("-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        def fetch(position, reverse, limit):
+            queryset_ = queryset.order_by(*self.get_ordering(reverse))
+            if position is not None:
+                queryset_ = queryset_.filter(self.after(position, reverse))
+            return list(queryset_[:limit])
+
+        return self.paginate(fetch, request, queryset.model)
+
+    def paginate(self, fetch, request, model=None):
+        """
+        Paginate with a custom row source: fetch(position, reverse, limit)
+        must return up to `limit` rows strictly after `position` in the
+        requested direction, already sorted. Cursor values are checked
+        against the ordering fields of `model`, when given.
+        """
+        self.request = request
+        position, reverse = self.decode_cursor(request, model)
+        rows = fetch(position, reverse, self.page_size + 1)
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows:
+            first, last = self.get_position(rows[0]), self.get_position(rows[-1])
+            if reverse:
+                self.next_position = last
+                self.previous_position = first if has_more else None
+            else:
+                self.next_position = last if has_more else None
+                self.previous_position = first if position is not None else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    # Ordering helpers
+
+    def get_fields(self):
+        return [field.lstrip("-") for field in self.ordering]
+
+    def get_ordering(self, reverse=False, fields=None):
+        """
+        order_by() arguments for reading in the given direction. `fields`
+        renames the ordering fields, for sources whose columns differ.
+        """
+        ordering = list(self.ordering)
+        if reverse:
+            ordering = [field[1:] if field.startswith("-") else f"-{field}" for field in ordering]
+        if fields is not None:
+            ordering = [("-" if field.startswith("-") else "") + name for field, name in zip(ordering, fields)]
+        return ordering
+
+    def after(self, position, reverse=False, fields=None):
+        """
+        Build the row-value comparison "(a, b) < (x, y)" as
+        a < x OR (a = x AND b < y), one clause per ordering field.
+        """
+        names = fields or self.get_fields()
+        condition = Q()
+        for index, field in enumerate(self.get_ordering(reverse)):
+            lookup = "lt" if field.startswith("-") else "gt"
+            clause = Q(**{f"{names[index]}__{lookup}": position[index]})
+            for name, value in zip(names[:index], position[:index]):
+                clause &= Q(**{name: value})
+            condition |= clause
+        return condition
+
+    def get_position(self, row):
+        if isinstance(row, dict):
+            return [row[field] for field in self.get_fields()]
+        return [getattr(row, field) for field in self.get_fields()]
+
+    # Cursor encoding
+
+    def decode_cursor(self, request, model=None):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            position = [
+                parse_datetime(value[1]) if isinstance(value, list) and value[0] == "dt" else value
+                for value in data["p"]
+            ]
+            reverse = bool(data.get("r"))
+            if len(position) != len(self.ordering) or None in position:
+                raise ValueError
+            if model is not None:
+                # A forged value would otherwise fail deep inside the query.
+                position = [
+                    model._meta.get_field(name).to_python(value) for name, value in zip(self.get_fields(), position)
+                ]
+        except (TypeError, ValueError, KeyError, IndexError, UnicodeError, AttributeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        values = [["dt", value.isoformat()] if isinstance(value, datetime) else value for value in position]
+        data = {"p": values}
+        if reverse:
+            data["r"] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode("ascii")).decode("ascii")
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, "page")
+        return replace_query_param(url, self.cursor_query_param, encoded)
@@ -0,0 +1,15 @@
+from rest_framework import serializers
+
+BATCH_LIMIT = 100
+
+
+class IdListSerializer(serializers.Serializer):
+    """Request body of the batch endpoints: {"ids": [1, 2, ...]}."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BATCH_LIMIT,
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))  # drop duplicates, keep order
@@ -48,7 +48,7 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 # DRF defaults (Token auth)
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # public endpoints by default; secure per-view
@@ -56,8 +56,60 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
     "DEFAULT_FILTER_BACKENDS": ["rest_framework.filters.SearchFilter"],
+    # Token buckets applied to views that set throttle_scope. Buckets live in
+    # the default cache, so point CACHES at a shared backend (e.g. Redis)
+    # when running several processes.
+    "DEFAULT_THROTTLE_CLASSES": ["accounts.throttling.TokenBucketThrottle"],
+    "DEFAULT_THROTTLE_RATES": {
+        "likes": "60/min",
+        "register": "5/hour",
+        "feed": "120/min",
+    },
 }
 
+# Token authentication cache (accounts.authentication): seconds an entry
+# lives and entries kept per process
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_SIZE = 10000
+
+# Seconds a user's cached block/mute sets live (accounts.exclusions)
+EXCLUSION_CACHE_TTL = 300
+
+# Seconds @mention autocomplete results are cached per prefix
+AUTOCOMPLETE_CACHE_TTL = 30
+# Prefixes up to this many characters also read the UsernamePrefix ranking.
+# Schedule refresh_username_prefixes hourly: between runs, accounts whose
+# follower counts changed or that are new are ranked only if they fall in
+# the first AUTOCOMPLETE_SCAN (500) name-ordered matches of a short prefix
+AUTOCOMPLETE_PREFIX_LENGTH = 3
+
+# Follow-graph snapshot the compute_influence command refreshes incrementally
+INFLUENCE_SNAPSHOT_PATH = BASE_DIR / "influence.npz"
+# Log every follow/unfollow to FollowEdgeChange so compute_influence can
+# replay them onto its snapshot. Only compute_influence deletes the log, so
+# enable this only where that command is scheduled; without it each run
+# reloads the follow table instead.
+FOLLOW_EDGE_LOG = False
+
+# Feed: number of entries kept per user in the materialized timeline
+TIMELINE_DEPTH = 500
+# Timelines are trimmed back to TIMELINE_DEPTH once they exceed it by this many
+TIMELINE_TRIM_SLACK = 50
+# Authors with at least this many followers are pulled at read time instead
+# of being fanned out to every follower on write
+FEED_FANOUT_THRESHOLD = 10000
+# Number of newest comments embedded in each post of a list response
+COMMENT_PREVIEW_SIZE = 3
+
+# Notifications sharing recipient, verb and target within this many seconds
+# are merged into one row ("alice and 41 others liked your post"); 0 disables
+NOTIFICATION_COALESCE_WINDOW = 24 * 60 * 60
+# Seconds between database checks (and keep-alives) on notification streams
+NOTIFICATION_STREAM_POLL_INTERVAL = 15
+# Retention enforced by the prune_notifications command; 0 disables either rule
+NOTIFICATION_RETENTION_DAYS = 90
+NOTIFICATION_MAX_PER_RECIPIENT = 1000
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
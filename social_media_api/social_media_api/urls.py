@@ -5,4 +5,5 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/accounts/', include('accounts.urls')),
     path("api/", include("posts.urls")),
+    path("api/", include("notifications.urls")),
 ]